@@ -0,0 +1,110 @@
+"""
+Hot/cold order tiering: finished orders past ORDER_ARCHIVE_AFTER_DAYS move to
+orders_archive so the hot orders collection and its indexes stay small.
+Reads go to the hot tier first and fall through to the archive only when needed.
+Run `python archive.py` from a scheduler (e.g. daily) to move orders in batches.
+"""
+import config
+from datetime import datetime, timedelta
+from pymongo import ReplaceOne, ReturnDocument
+from cache import TTLCache
+from pagination import fetch_page, created_at_cursor, CREATED_AT_SORT
+import asyncio
+import os
+
+ORDERS_ARCHIVE_COLLECTION = "orders_archive"
+ORDER_ARCHIVE_AFTER_DAYS = int(os.environ.get("ORDER_ARCHIVE_AFTER_DAYS", "90"))
+ORDER_ARCHIVE_BATCH_SIZE = int(os.environ.get("ORDER_ARCHIVE_BATCH_SIZE", "500"))
+# Only statuses with no way out are archived, so archived orders never change
+ARCHIVED_STATUSES = ["delivered", "cancelled"]
+
+# No archived order is newer than this; pages entirely newer than it never touch the archive
+ARCHIVE_HORIZON_COUNTER = "orders_archive_horizon"
+ARCHIVE_HORIZON_TTL_SECONDS = float(os.environ.get("ARCHIVE_HORIZON_TTL_SECONDS", "30"))
+
+_horizon_cache = TTLCache(max_entries=1, ttl_seconds=ARCHIVE_HORIZON_TTL_SECONDS)
+
+async def archive_horizon(database):
+    """Upper bound on created_at in the archive, or None while nothing was archived."""
+    horizon = _horizon_cache.get(ARCHIVE_HORIZON_COUNTER)
+    if horizon is None:
+        counter = await database.counters.find_one({"_id": ARCHIVE_HORIZON_COUNTER})
+        horizon = counter["created_at"] if counter else datetime.min
+        _horizon_cache.set(ARCHIVE_HORIZON_COUNTER, horizon)
+    return None if horizon == datetime.min else horizon
+
+async def find_order(database, query: dict, projection: dict = None):
+    order = await database.orders.find_one(query, projection)
+    if order is None and await archive_horizon(database) is not None:
+        order = await database[ORDERS_ARCHIVE_COLLECTION].find_one(query, projection)
+    return order
+
+async def fetch_order_page(database, query: dict, limit: int):
+    """
+    fetch_page over both tiers, newest first. The archive is only read when the
+    hot page comes up short or reaches back past the archive horizon; both
+    tiers are then merged so ordering and cursors stay exact.
+    """
+    orders, next_cursor = await fetch_page(database.orders, query, CREATED_AT_SORT, limit, created_at_cursor)
+    horizon = await archive_horizon(database)
+    if horizon is None or (next_cursor is not None and orders[-1]["created_at"] > horizon):
+        return orders, next_cursor
+
+    archived = await database[ORDERS_ARCHIVE_COLLECTION].find(query).sort(CREATED_AT_SORT).limit(limit + 1).to_list(limit + 1)
+    # An order caught mid-move can be in both tiers for a moment
+    merged = {order["_id"]: order for order in archived}
+    merged.update((order["_id"], order) for order in orders)
+    docs = sorted(merged.values(), key=lambda order: (order["created_at"], order["_id"]), reverse=True)
+
+    has_more = next_cursor is not None or len(docs) > limit
+    docs = docs[:limit]
+    return docs, created_at_cursor(docs[-1]) if has_more and docs else None
+
+async def archive_orders(database, older_than_days: int = ORDER_ARCHIVE_AFTER_DAYS, batch_size: int = ORDER_ARCHIVE_BATCH_SIZE) -> int:
+    """
+    Move finished orders created more than older_than_days ago into the archive.
+    Each batch is copied (idempotently) before it is deleted, so an interrupted
+    run leaves duplicates that the next run and the merged reads both tolerate.
+    """
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    query = {"status": {"$in": ARCHIVED_STATUSES}, "created_at": {"$lt": cutoff}}
+    if await database.orders.find_one(query, {"_id": 1}) is None:
+        return 0
+
+    # Publish the cutoff as the horizon up front, then outwait every worker's
+    # cached copy, so no reader still skips the archive once orders leave the hot tier
+    previous = await database.counters.find_one_and_update(
+        {"_id": ARCHIVE_HORIZON_COUNTER},
+        {"$max": {"created_at": cutoff}},
+        upsert=True,
+        return_document=ReturnDocument.BEFORE
+    )
+    _horizon_cache.clear()
+    if previous is None or previous["created_at"] < cutoff:
+        await asyncio.sleep(ARCHIVE_HORIZON_TTL_SECONDS + 1)
+
+    moved = 0
+    while True:
+        batch = await database.orders.find(query).sort("created_at", 1).limit(batch_size).to_list(batch_size)
+        if not batch:
+            return moved
+
+        await database[ORDERS_ARCHIVE_COLLECTION].bulk_write(
+            [ReplaceOne({"_id": order["_id"]}, order, upsert=True) for order in batch], ordered=False
+        )
+        result = await database.orders.delete_many({
+            "_id": {"$in": [order["_id"] for order in batch]},
+            "status": {"$in": ARCHIVED_STATUSES}
+        })
+        moved += result.deleted_count
+
+async def main():
+    from database import db
+
+    await db.connect_db()
+    moved = await archive_orders(db.get_db())
+    print(f"✅ Archived {moved} orders older than {ORDER_ARCHIVE_AFTER_DAYS} days")
+    await db.close_db()
+
+if __name__ == "__main__":
+    asyncio.run(main())
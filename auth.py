@@ -4,13 +4,29 @@ from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from bson import ObjectId
+from models import TokenData
+from database import db
+from cache import TTLCache
+from concurrency import BoundedPool
+from metrics import CallbackMetric, Histogram
+from revocation import revocation_list
+import hashlib
 import os
+import time
+import uuid
 
 # Security configurations
 SECRET_KEY = os.environ.get("SECRET_KEY", "your-secret-key-keep-it-secret-in-production-09876543210")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7  # 7 days
 
+# Verified principals keyed by token digest, so repeat requests skip JWT decoding
+TOKEN_CACHE_TTL_SECONDS = float(os.environ.get("TOKEN_CACHE_TTL_SECONDS", "300"))
+TOKEN_CACHE_MAX_ENTRIES = int(os.environ.get("TOKEN_CACHE_MAX_ENTRIES", "10000"))
+
+token_cache = TTLCache(max_entries=TOKEN_CACHE_MAX_ENTRIES, ttl_seconds=TOKEN_CACHE_TTL_SECONDS)
+
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
@@ -20,6 +36,31 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
+# bcrypt runs on a bounded worker pool so it never blocks the event loop
+PASSWORD_POOL_KIND = os.environ.get("PASSWORD_POOL_KIND", "thread")
+PASSWORD_POOL_WORKERS = int(os.environ.get("PASSWORD_POOL_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_POOL_MAX_PENDING = int(os.environ.get("PASSWORD_POOL_MAX_PENDING", str(PASSWORD_POOL_WORKERS * 8)))
+
+password_pool_latency = Histogram(
+    "password_pool_duration_seconds", "Queue wait plus bcrypt time per password operation", ("operation",)
+)
+password_pool = BoundedPool(
+    PASSWORD_POOL_KIND, PASSWORD_POOL_WORKERS, PASSWORD_POOL_MAX_PENDING,
+    thread_name_prefix="bcrypt", latency=password_pool_latency
+)
+CallbackMetric("password_pool_in_flight", "Password operations queued or running", "gauge", lambda: password_pool.pending)
+CallbackMetric("password_pool_rejected_total", "Password operations rejected because the pool was full", "counter", lambda: password_pool.rejected)
+CallbackMetric(
+    "token_cache_events_total", "Verified-token cache lookups", "counter",
+    lambda: {"hit": token_cache.hits, "miss": token_cache.misses}, ("event",)
+)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await password_pool.run(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    return await password_pool.run(get_password_hash, password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -27,6 +68,8 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     else:
         expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
+    to_encode.setdefault("iat", time.time())
+    to_encode.setdefault("jti", uuid.uuid4().hex)
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
@@ -37,13 +80,33 @@ def verify_token(token: str) -> dict:
     except JWTError:
         return None
 
-async def get_current_user(token: str = Depends(oauth2_scheme)):
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> TokenData:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
     
+    database = db.get_db()
+    digest = hashlib.sha256(token.encode()).digest()
+    cached = token_cache.get(digest)
+    if cached is None:
+        principal, claims = await _verify_principal(database, token, credentials_exception)
+        ttl = TOKEN_CACHE_TTL_SECONDS
+        if principal.exp is not None:
+            ttl = min(ttl, principal.exp - time.time())
+        if ttl > 0:
+            token_cache.set(digest, (principal, claims), ttl)
+    else:
+        principal, claims = cached
+    
+    revocation_list.maybe_sync(database)
+    if await revocation_list.is_revoked(database, claims):
+        raise credentials_exception
+    
+    return principal
+
+async def _verify_principal(database, token: str, credentials_exception: HTTPException):
     payload = verify_token(token)
     if payload is None:
         raise credentials_exception
@@ -52,10 +115,26 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
     if email is None:
         raise credentials_exception
     
-    return {"email": email, "is_admin": payload.get("is_admin", False)}
+    user_id: str = payload.get("uid")
+    if user_id is None or not ObjectId.is_valid(user_id):
+        # Tokens issued before the user id was embedded fall back to a lookup
+        user = await database.users.find_one({"email": email}, {"_id": 1})
+        if not user:
+            raise credentials_exception
+        user_id = str(user["_id"])
+    
+    principal = TokenData(
+        email=email,
+        user_id=user_id,
+        is_admin=payload.get("is_admin", False),
+        jti=payload.get("jti"),
+        exp=payload.get("exp")
+    )
+    claims = {"uid": user_id, "jti": payload.get("jti"), "iat": payload.get("iat", 0)}
+    return principal, claims
 
-async def get_current_admin(current_user: dict = Depends(get_current_user)):
-    if not current_user.get("is_admin"):
+async def get_current_admin(current_user: TokenData = Depends(get_current_user)) -> TokenData:
+    if not current_user.is_admin:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Admin access required"
@@ -0,0 +1,248 @@
+"""
+End-to-end load and latency benchmark for the FastAPI app, driven in process over ASGI
+Run from the repository root:
+    python benchmarks/load_bench.py                        # in-memory Motor stand-in
+    python benchmarks/load_bench.py --backend mongo        # local mongod at MONGO_URL
+    python benchmarks/load_bench.py --save-baseline        # record benchmarks/baseline.json
+    python benchmarks/load_bench.py --tolerance 0.25       # fail if slower than the baseline
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Every simulated client shares one address, so the login/register limits would
+# reject the register_login scenario; read at import time by ratelimit.py
+os.environ.setdefault("RATE_LIMIT_ENABLED", "0")
+
+import httpx
+
+import database
+from auth import create_access_token, get_password_hash, password_pool
+from database import Database
+from indexes import ensure_indexes
+from routes.product_routes import invalidate_product_cache
+from server import app
+from benchmarks.stats import percentile
+from benchmarks.synthetic import CATEGORIES, STATUSES, synthetic_orders, synthetic_products, synthetic_users
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+BENCH_DB_NAME = os.environ.get("BENCH_DB_NAME", "handmade_glow_bench")
+BENCH_PASSWORD = "bench-password"
+
+class Fixture:
+    def __init__(self, products: list, users: list):
+        self.products = products
+        self.purchasable = [product for product in products if product["in_stock"]]
+        self.users = users
+        self.user_tokens = [
+            create_access_token({"sub": user["email"], "uid": str(user["_id"]), "is_admin": False})
+            for user in users
+        ]
+        self.admin_token = create_access_token({"sub": "admin@example.com", "uid": str(users[0]["_id"]), "is_admin": True})
+        self.registered = 0
+
+    def user_headers(self, rng) -> dict:
+        return {"Authorization": f"Bearer {rng.choice(self.user_tokens)}"}
+
+async def connect(backend: str):
+    if backend == "mongo":
+        from motor.motor_asyncio import AsyncIOMotorClient
+
+        Database.client = AsyncIOMotorClient(database.MONGO_URL, **database.client_options())
+    else:
+        from mongomock_motor import AsyncMongoMockClient
+
+        Database.client = AsyncMongoMockClient()
+    # The app reads DB_NAME at call time, so this keeps the real database untouched
+    database.DB_NAME = BENCH_DB_NAME
+
+async def seed(args) -> Fixture:
+    db = Database.get_db()
+    for name in ("products", "users", "orders", "sales_rollups", "counters", "idempotency_keys"):
+        await db[name].drop()
+    if args.backend == "mongo":
+        await ensure_indexes(db)
+
+    products = synthetic_products(args.products)
+    for product in products:
+        product["stock"] = None
+    users = synthetic_users(args.users, get_password_hash(BENCH_PASSWORD))
+    orders = synthetic_orders(args.orders, [user["_id"] for user in users], products[:50])
+
+    await db.products.insert_many(products)
+    await db.users.insert_many(users)
+    for start in range(0, len(orders), 5000):
+        await db.orders.insert_many(orders[start:start + 5000])
+    await invalidate_product_cache(db)
+    return Fixture(products, users)
+
+# Scenarios: each makes one or more requests and raises on an unexpected status
+
+def expect(response, code: int = 200):
+    if response.status_code != code:
+        raise RuntimeError(f"{response.request.method} {response.request.url.path} -> {response.status_code}: {response.text[:200]}")
+
+async def browse_catalog(client, fixture, rng):
+    expect(await client.get("/api/products/", params={"category": rng.choice(CATEGORIES), "view": "summary", "limit": 48}))
+
+async def view_product(client, fixture, rng):
+    expect(await client.get(f"/api/products/{rng.choice(fixture.products)['_id']}"))
+
+async def register_login(client, fixture, rng):
+    fixture.registered += 1
+    email = f"bench-{os.getpid()}-{fixture.registered}@example.com"
+    expect(await client.post("/api/auth/register", json={"name": "Bench", "email": email, "password": BENCH_PASSWORD}))
+    expect(await client.post("/api/auth/login", json={"email": email, "password": BENCH_PASSWORD}))
+
+async def checkout(client, fixture, rng):
+    items = [
+        {"product_id": str(product["_id"]), "name": product["name"], "price": product["price"],
+         "quantity": rng.randint(1, 3), "image": product["image"]}
+        for product in rng.sample(fixture.purchasable, 2)
+    ]
+    body = {
+        "items": items,
+        "shipping_address": {"name": "Bench", "phone": "1", "address": "Street", "city": "Pune", "state": "MH", "pincode": "411001"},
+        "payment_method": "cod",
+    }
+    expect(await client.post("/api/orders/", json=body, headers=fixture.user_headers(rng)))
+
+async def my_orders(client, fixture, rng):
+    expect(await client.get("/api/orders/my-orders", params={"limit": 20}, headers=fixture.user_headers(rng)))
+
+async def admin_orders(client, fixture, rng):
+    headers = {"Authorization": f"Bearer {fixture.admin_token}"}
+    expect(await client.get("/api/orders/", params={"status_filter": rng.choice(STATUSES), "limit": 50}, headers=headers))
+
+# name -> (scenario, share of --requests, bounded by the bcrypt pool)
+SCENARIOS = {
+    "browse_catalog": (browse_catalog, 1.0, False),
+    "view_product": (view_product, 1.0, False),
+    "register_login": (register_login, 0.1, True),
+    "checkout": (checkout, 0.5, False),
+    "my_orders": (my_orders, 1.0, False),
+    "admin_orders": (admin_orders, 0.5, False),
+}
+
+async def run_scenario(client, fixture, scenario, requests: int, concurrency: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    latencies = []
+    errors = []
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            started = time.perf_counter()
+            try:
+                await scenario(client, fixture, rng)
+            except Exception as e:
+                errors.append(str(e))
+                continue
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - started
+
+    if errors:
+        print(f"   {len(errors)} errors, first: {errors[0]}")
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+    }
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get("scenarios", {}).get(name)
+        if not base:
+            continue
+        if result["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {result['p95_ms']}ms vs baseline {base['p95_ms']}ms")
+        if result["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{name}: {result['throughput_rps']} rps vs baseline {base['throughput_rps']} rps")
+        if result["errors"]:
+            regressions.append(f"{name}: {result['errors']} errors")
+    return regressions
+
+async def main(args):
+    await connect(args.backend)
+    fixture = await seed(args)
+
+    selected = args.scenario or list(SCENARIOS)
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        print(f"{'scenario':<16} {'req':>6} {'rps':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+        for index, name in enumerate(selected):
+            scenario, share, uses_bcrypt = SCENARIOS[name]
+            requests = max(1, int(args.requests * share))
+            # More concurrent bcrypt calls than the pool admits would only measure 503s
+            concurrency = min(args.concurrency, password_pool.max_pending) if uses_bcrypt else args.concurrency
+            # Warm caches and code paths before measuring
+            await run_scenario(client, fixture, scenario, min(requests, concurrency), concurrency, index)
+            result = await run_scenario(client, fixture, scenario, requests, concurrency, 1000 + index)
+            results[name] = result
+            print(
+                f"{name:<16} {result['requests']:>6} {result['throughput_rps']:>9.1f} "
+                f"{result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f} {result['p99_ms']:>8.2f}"
+            )
+
+    report = {
+        "backend": args.backend,
+        "concurrency": args.concurrency,
+        "dataset": {"products": args.products, "users": args.users, "orders": args.orders},
+        "scenarios": results,
+    }
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("No baseline to compare against; run with --save-baseline first")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get("backend") != args.backend:
+        print(f"Baseline was recorded with the {baseline.get('backend')} backend; skipping comparison")
+        return 0
+
+    regressions = compare(results, baseline, args.tolerance)
+    for regression in regressions:
+        print(f"❌ {regression}")
+    if not regressions:
+        print(f"✅ Within {args.tolerance:.0%} of baseline")
+    return 1 if regressions else 0
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=["memory", "mongo"], default="memory")
+    parser.add_argument("--scenario", action="append", choices=list(SCENARIOS), help="run only these scenarios")
+    parser.add_argument("--requests", type=int, default=500, help="requests per scenario before its share is applied")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--products", type=int, default=500)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--orders", type=int, default=5000)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed fractional regression in p95 and throughput")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(parse_args())))
@@ -0,0 +1,69 @@
+"""
+Latency of the faceted product search against a 100k-product synthetic catalog
+Needs a running mongod: `MONGO_URL=mongodb://localhost:27017 python benchmarks/search_bench.py`
+Seeds a separate database (BENCH_DB_NAME) so the real catalog is never touched
+"""
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from database import MONGO_URL
+from indexes import ensure_indexes
+from product_search import search_match, run_search
+from routes.product_routes import SUMMARY_PROJECTION
+from benchmarks.stats import percentile
+from benchmarks.synthetic import synthetic_products
+
+BENCH_DB_NAME = os.environ.get("BENCH_DB_NAME", "handmade_glow_bench")
+CATALOG_SIZE = int(os.environ.get("BENCH_CATALOG_SIZE", "100000"))
+ITERATIONS = int(os.environ.get("BENCH_ITERATIONS", "50"))
+
+# (label, search_match kwargs, sort)
+SCENARIOS = [
+    ("text", {"q": "lavender"}, "relevance"),
+    ("text + filters", {"q": "vanilla amber", "wax_type": "Soy Wax", "in_stock": True}, "rating"),
+    ("price range", {"min_price": 500, "max_price": 1000}, "price_asc"),
+    ("wax type", {"wax_type": "Beeswax"}, "rating"),
+    ("category + stock", {"category": "floral", "in_stock": True}, "price_desc"),
+]
+
+async def seed(database):
+    if await database.products.estimated_document_count() == CATALOG_SIZE:
+        return
+    await database.products.drop()
+    for start in range(0, CATALOG_SIZE, 10000):
+        batch = synthetic_products(min(10000, CATALOG_SIZE - start), seed=start, start=start)
+        await database.products.insert_many(batch, ordered=False)
+    print(f"Seeded {CATALOG_SIZE} products into {BENCH_DB_NAME}")
+
+async def main():
+    client = AsyncIOMotorClient(MONGO_URL)
+    database = client[BENCH_DB_NAME]
+
+    await seed(database)
+    await ensure_indexes(database)
+
+    print(f"{'scenario':<18} {'hits':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for label, filters, sort in SCENARIOS:
+        match = search_match(**filters)
+        samples = []
+        total = 0
+        for _ in range(ITERATIONS):
+            started = time.perf_counter()
+            result = await run_search(database.products, match, sort, 0, 24, SUMMARY_PROJECTION)
+            samples.append((time.perf_counter() - started) * 1000)
+            total = result["total"]
+        print(
+            f"{label:<18} {total:>7} {percentile(samples, 50):>8.2f} "
+            f"{percentile(samples, 95):>8.2f} {percentile(samples, 99):>8.2f}"
+        )
+
+    client.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,54 @@
+"""
+Per-item cost of the list endpoint response path, before and after LeanJSONResponse
+Run from the repository root: `python benchmarks/serialization_bench.py`
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+import json
+
+from models import OrderPage, ProductPage
+from serialization import dumps
+from benchmarks.synthetic import synthetic_orders, synthetic_products
+
+ITEMS = 200
+ROUNDS = 50
+
+def model_path(adapter, page: dict) -> bytes:
+    # What FastAPI does for a dict returned under response_model
+    validated = adapter.validate_python(page)
+    return json.dumps(jsonable_encoder(validated)).encode("utf-8")
+
+def lean_path(page: dict) -> bytes:
+    return dumps(page)
+
+def per_item_us(fn, *args) -> float:
+    started = time.perf_counter()
+    for _ in range(ROUNDS):
+        fn(*args)
+    return (time.perf_counter() - started) / (ROUNDS * ITEMS) * 1_000_000
+
+def main():
+    from routes.order_routes import order_helper
+    from routes.product_routes import product_helper
+
+    cases = [
+        ("products", ProductPage, product_helper, synthetic_products(ITEMS)),
+        ("orders", OrderPage, order_helper, synthetic_orders(ITEMS)),
+    ]
+    for name, model, helper, docs in cases:
+        adapter = TypeAdapter(model)
+        page = {"items": [helper(doc) for doc in docs], "next_cursor": None}
+        assert json.loads(model_path(adapter, page)) == json.loads(lean_path(page))
+
+        before = per_item_us(lambda: model_path(adapter, {"items": [helper(doc) for doc in docs], "next_cursor": None}))
+        after = per_item_us(lambda: lean_path({"items": [helper(doc) for doc in docs], "next_cursor": None}))
+        print(f"{name:<9} response_model: {before:7.2f} µs/item   lean: {after:7.2f} µs/item   ({before / after:.1f}x)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Synthetic catalog, user and order documents for benchmarks
+"""
+import random
+from datetime import datetime, timedelta
+from bson import ObjectId
+
+CATEGORIES = ["floral", "woody", "fresh", "sweet", "citrus", "gift"]
+WAX_TYPES = ["Soy Wax", "Beeswax", "Coconut Wax", "Premium Soy Wax", "Paraffin Blend"]
+NOTES = [
+    "Lavender", "Chamomile", "Vanilla", "Sandalwood", "Cedar", "Rose", "Jasmine", "Orange",
+    "Lemon", "Grapefruit", "Amber", "Musk", "Eucalyptus", "Mint", "Coconut", "Cinnamon"
+]
+ADJECTIVES = ["Calm", "Golden", "Velvet", "Midnight", "Morning", "Wild", "Cozy", "Serene"]
+STATUSES = ["pending", "confirmed", "shipped", "delivered", "cancelled"]
+
+def synthetic_products(n: int, seed: int = 42, start: int = 0) -> list:
+    # start offsets the numbering so batches generated separately keep unique SKUs
+    rng = random.Random(seed)
+    products = []
+    for i in range(start, start + n):
+        notes = rng.sample(NOTES, 3)
+        price = rng.randrange(299, 2999, 50)
+        markup = rng.choice([0, 100, 200, 400])
+        products.append({
+            "_id": ObjectId(),
+            "sku": f"SKU-{i:07d}",
+            "name": f"{rng.choice(ADJECTIVES)} {notes[0]} Candle {i}",
+            "category": rng.choice(CATEGORIES),
+            "price": price,
+            "original_price": price + markup if markup else None,
+            "image": f"https://example.com/candles/{i}.jpg?w=800",
+            "images": [f"https://example.com/candles/{i}-{k}.jpg?w=800" for k in range(3)],
+            "description": f"Hand-poured candle with notes of {', '.join(notes)}. " * 2,
+            "details": "Cotton wick, reusable glass jar, made in small batches.",
+            "wax_type": rng.choice(WAX_TYPES),
+            "burn_time": f"{rng.randrange(20, 60)} hours",
+            "weight": f"{rng.choice([150, 200, 250, 300])}g",
+            "fragrance_notes": notes,
+            "rating": round(rng.uniform(3.5, 5.0), 1),
+            "reviews": rng.randrange(0, 500),
+            "in_stock": rng.random() > 0.1,
+            "featured": rng.random() > 0.9,
+            "bestseller": rng.random() > 0.9,
+        })
+    return products
+
+def synthetic_users(n: int, password_hash: str) -> list:
+    now = datetime.utcnow()
+    return [
+        {
+            "_id": ObjectId(),
+            "name": f"User {i}",
+            "email": f"user{i}@example.com",
+            "password": password_hash,
+            "phone": None,
+            "is_admin": False,
+            "created_at": now,
+            "updated_at": now,
+        }
+        for i in range(n)
+    ]
+
+def synthetic_orders(n: int, user_ids: list = None, products: list = None, seed: int = 42) -> list:
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    orders = []
+    for i in range(n):
+        if products:
+            picked = rng.sample(products, min(3, len(products)))
+            items = [
+                {"product_id": str(p["_id"]), "name": p["name"], "price": p["price"], "quantity": rng.randint(1, 3), "image": p["image"]}
+                for p in picked
+            ]
+        else:
+            items = [
+                {"product_id": str(ObjectId()), "name": "Candle", "price": 499, "quantity": 2, "image": "https://example.com/c.jpg"}
+            ] * 3
+        created_at = now - timedelta(minutes=i)
+        orders.append({
+            "_id": ObjectId(),
+            "user_id": rng.choice(user_ids) if user_ids else ObjectId(),
+            "order_number": f"ORD-{i:08d}",
+            "items": items,
+            "shipping_address": {"name": "A", "phone": "1", "address": "Street", "city": "Pune", "state": "MH", "pincode": "411001"},
+            "payment_method": "cod",
+            "status": rng.choice(STATUSES),
+            "total": sum(item["price"] * item["quantity"] for item in items),
+            "notes": None,
+            "created_at": created_at,
+            "updated_at": created_at,
+        })
+    return orders
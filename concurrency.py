@@ -0,0 +1,105 @@
+"""
+Shared concurrency helpers: a bounded executor pool for CPU-heavy work and
+single-flight coalescing of concurrent calls for the same key
+"""
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+from fastapi import HTTPException, status
+import asyncio
+import time
+
+class BoundedPool:
+    """
+    Runs blocking functions on a lazily created thread or process pool so they
+    never block the event loop. Once max_pending calls are queued or running,
+    further calls are rejected with a 503 instead of queueing without bound.
+    """
+
+    def __init__(self, kind: str, workers: int, max_pending: int, thread_name_prefix: str = "", latency=None):
+        self.kind = kind
+        self.workers = workers
+        self.max_pending = max_pending
+        self.thread_name_prefix = thread_name_prefix
+        # Optional Histogram observed per call, labelled with the function name
+        self.latency = latency
+        self._executor: Optional[Executor] = None
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=self.thread_name_prefix)
+        return self._executor
+
+    async def run(self, fn, *args):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server busy, please retry",
+                headers={"Retry-After": "1"},
+            )
+
+        self.pending += 1
+        started = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            elapsed = time.perf_counter() - started
+            if self.latency is not None:
+                self.latency.observe((fn.__name__,), elapsed)
+            self.pending -= 1
+            self.completed += 1
+            self.total_seconds += elapsed
+            self.max_seconds = max(self.max_seconds, elapsed)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {
+            "kind": self.kind,
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "in_flight": self.pending,
+            "queue_depth": max(0, self.pending - self.workers),
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_latency_ms": round(self.total_seconds / self.completed * 1000, 2) if self.completed else 0.0,
+            "max_latency_ms": round(self.max_seconds * 1000, 2),
+        }
+
+async def single_flight(in_flight: dict, key, fn):
+    """
+    Await fn() at most once at a time per key. Callers arriving while it runs
+    share its result or exception; in_flight is the caller's key -> future map.
+    """
+    future = in_flight.get(key)
+    if future is not None:
+        return await asyncio.shield(future)
+
+    future = asyncio.get_running_loop().create_future()
+    in_flight[key] = future
+    try:
+        result = await fn()
+        future.set_result(result)
+        return result
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as e:
+        future.set_exception(e)
+        # Mark retrieved so an unobserved failure doesn't log a warning
+        future.exception()
+        raise
+    finally:
+        del in_flight[key]
@@ -0,0 +1,7 @@
+"""
+Loads .env into the environment once per process. Import this before any
+module that reads os.environ at import time.
+"""
+from dotenv import load_dotenv
+
+load_dotenv()
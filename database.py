@@ -1,19 +1,78 @@
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.read_preferences import SecondaryPreferred
+import asyncio
 import os
-from dotenv import load_dotenv
-
-load_dotenv()
+import time
+import config
+from indexes import ensure_indexes
+from metrics import MongoCommandMetrics, MongoPoolMetrics, mongo_pool_connections, mongo_pool_in_use
 
 MONGO_URL = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
 DB_NAME = "handmade_glow_db"
 
+# Connection pool and timeout settings
+MONGO_MAX_POOL_SIZE = int(os.environ.get('MONGO_MAX_POOL_SIZE', '100'))
+MONGO_MIN_POOL_SIZE = int(os.environ.get('MONGO_MIN_POOL_SIZE', '5'))
+MONGO_MAX_IDLE_TIME_MS = int(os.environ.get('MONGO_MAX_IDLE_TIME_MS', '300000'))
+MONGO_CONNECT_TIMEOUT_MS = int(os.environ.get('MONGO_CONNECT_TIMEOUT_MS', '5000'))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.environ.get('MONGO_SERVER_SELECTION_TIMEOUT_MS', '5000'))
+MONGO_SOCKET_TIMEOUT_MS = int(os.environ.get('MONGO_SOCKET_TIMEOUT_MS', '20000'))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.environ.get('MONGO_WAIT_QUEUE_TIMEOUT_MS', '2000'))
+# Comma separated, e.g. "zstd,snappy,zlib"; zstd and snappy need their python packages
+MONGO_COMPRESSORS = os.environ.get('MONGO_COMPRESSORS', '')
+
+# Catalog reads tolerate a little replication lag; orders and users never do.
+# Secondaries further behind than this are skipped (90 is MongoDB's minimum).
+CATALOG_MAX_STALENESS_SECONDS = int(os.environ.get("CATALOG_MAX_STALENESS_SECONDS", "90"))
+CATALOG_READ_PREFERENCE = SecondaryPreferred(max_staleness=CATALOG_MAX_STALENESS_SECONDS)
+READY_PING_TIMEOUT_SECONDS = float(os.environ.get('READY_PING_TIMEOUT_SECONDS', '2'))
+# The production launcher creates indexes once and turns this off for its workers
+MONGO_ENSURE_INDEXES = os.environ.get('MONGO_ENSURE_INDEXES', '1') != '0'
+
+def client_options() -> dict:
+    options = {
+        "maxPoolSize": MONGO_MAX_POOL_SIZE,
+        "minPoolSize": MONGO_MIN_POOL_SIZE,
+        "maxIdleTimeMS": MONGO_MAX_IDLE_TIME_MS,
+        "connectTimeoutMS": MONGO_CONNECT_TIMEOUT_MS,
+        "serverSelectionTimeoutMS": MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "socketTimeoutMS": MONGO_SOCKET_TIMEOUT_MS,
+        "waitQueueTimeoutMS": MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        "retryWrites": True,
+        "retryReads": True,
+    }
+    if MONGO_COMPRESSORS:
+        options["compressors"] = MONGO_COMPRESSORS
+    return options
+
 class Database:
     client: AsyncIOMotorClient = None
     
     @classmethod
     async def connect_db(cls):
-        cls.client = AsyncIOMotorClient(MONGO_URL)
+        cls.client = AsyncIOMotorClient(
+            MONGO_URL,
+            event_listeners=[MongoCommandMetrics(), MongoPoolMetrics()],
+            **client_options()
+        )
         print(f"Connected to MongoDB at {MONGO_URL}")
+        if not await cls.warm_pool():
+            print("⚠️  Skipped index creation; MongoDB is unreachable")
+        elif MONGO_ENSURE_INDEXES:
+            await ensure_indexes(cls.get_db())
+    
+    @classmethod
+    async def warm_pool(cls) -> bool:
+        # Concurrent pings each need their own connection, so the pool is
+        # filled up front instead of on the first burst of real requests
+        connections = max(1, MONGO_MIN_POOL_SIZE)
+        try:
+            await asyncio.gather(*[cls.client.admin.command("ping") for _ in range(connections)])
+        except Exception as e:
+            print(f"⚠️  MongoDB pool warmup failed: {e}")
+            return False
+        print(f"Warmed MongoDB pool with {connections} connections")
+        return True
     
     @classmethod
     async def close_db(cls):
@@ -24,6 +83,32 @@ class Database:
     @classmethod
     def get_db(cls):
         return cls.client[DB_NAME]
+    
+    @classmethod
+    def get_catalog_db(cls, recently_changed: bool = False):
+        """
+        Database handle for product reads, routed to secondaries when available.
+        Pass recently_changed right after a catalog write: a secondary may not have
+        it yet, and whatever is read gets cached under the new catalog version.
+        """
+        if recently_changed:
+            return cls.get_db()
+        return cls.client.get_database(DB_NAME, read_preference=CATALOG_READ_PREFERENCE)
+    
+    @classmethod
+    async def ping(cls) -> float:
+        started = time.perf_counter()
+        await asyncio.wait_for(cls.client.admin.command("ping"), READY_PING_TIMEOUT_SECONDS)
+        return (time.perf_counter() - started) * 1000
+    
+    @classmethod
+    def pool_stats(cls) -> dict:
+        return {
+            "max_pool_size": MONGO_MAX_POOL_SIZE,
+            "min_pool_size": MONGO_MIN_POOL_SIZE,
+            "open_connections": int(mongo_pool_connections.value()),
+            "in_use": int(mongo_pool_in_use.value()),
+        }
 
 # Database instance
-db = Database()
\ No newline at end of file
+db = Database()
@@ -0,0 +1,126 @@
+"""
+Rendered, precompressed catalog responses with strong ETags
+"""
+from fastapi import Request
+from fastapi.responses import Response
+from pymongo import ReturnDocument
+import asyncio
+import brotli
+import gzip
+import hashlib
+import os
+import time
+
+# Bodies smaller than this are sent as-is; compression wouldn't pay for itself
+COMPRESS_MIN_BYTES = 512
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+CATALOG_CACHE_CONTROL = "public, max-age=0, must-revalidate"
+
+CATALOG_VERSION_COUNTER = "catalog_version"
+CATALOG_VERSION_POLL_SECONDS = float(os.environ.get("CATALOG_VERSION_POLL_SECONDS", "5"))
+
+class RenderedResponse:
+    """One JSON body plus its compressed variants, built once when cached."""
+
+    __slots__ = ("body", "variants", "etag")
+
+    def __init__(self, body: bytes, version: int):
+        self.body = body
+        self.etag = f'"v{version}-{hashlib.sha256(body).hexdigest()[:32]}"'
+        self.variants = {}
+        if len(body) >= COMPRESS_MIN_BYTES:
+            self.variants["br"] = brotli.compress(body, quality=BROTLI_QUALITY)
+            self.variants["gzip"] = gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+def _accepted_encodings(header: str) -> set:
+    accepted = set()
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        params = params.replace(" ", "")
+        if params.startswith("q=") and params[2:] in ("0", "0.0", "0.00", "0.000"):
+            continue
+        if coding:
+            accepted.add(coding.lower())
+    return accepted
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    candidates = [candidate.strip() for candidate in header.split(",")]
+    # Compression never changes the ETag, so a W/ prefix from a proxy still matches
+    return etag in candidates or f"W/{etag}" in candidates
+
+def catalog_response(request: Request, rendered: RenderedResponse) -> Response:
+    headers = {
+        "ETag": rendered.etag,
+        "Cache-Control": CATALOG_CACHE_CONTROL,
+        "Vary": "Accept-Encoding",
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, rendered.etag):
+        return Response(status_code=304, headers=headers)
+
+    body = rendered.body
+    if rendered.variants:
+        accepted = _accepted_encodings(request.headers.get("accept-encoding", ""))
+        for encoding in ("br", "gzip"):
+            if encoding in accepted:
+                body = rendered.variants[encoding]
+                headers["Content-Encoding"] = encoding
+                break
+
+    return Response(content=body, media_type="application/json", headers=headers)
+
+class CatalogVersion:
+    """
+    Version number of the product catalog, kept in the counters collection.
+    Admin writes bump it; every worker polls it in the background and drops its
+    rendered catalog cache when it moves, so a write on one worker reaches all.
+    """
+
+    def __init__(self, on_change):
+        self.value = 0
+        self.changed_at = float("-inf")
+        self._on_change = on_change
+        self._last_poll = 0.0
+        self._poll_task = None
+
+    def _set(self, value: int):
+        if value != self.value:
+            self.value = value
+            self.changed_at = time.monotonic()
+            self._on_change()
+
+    async def bump(self, database):
+        counter = await database.counters.find_one_and_update(
+            {"_id": CATALOG_VERSION_COUNTER},
+            {"$inc": {"seq": 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        self._last_poll = time.monotonic()
+        self._set(counter["seq"])
+
+    def changed_within(self, seconds: float) -> bool:
+        return time.monotonic() - self.changed_at < seconds
+
+    async def refresh(self, database):
+        counter = await database.counters.find_one({"_id": CATALOG_VERSION_COUNTER})
+        self._set(counter["seq"] if counter else 0)
+
+    def maybe_refresh(self, database):
+        now = time.monotonic()
+        if now - self._last_poll < CATALOG_VERSION_POLL_SECONDS:
+            return
+        if self._poll_task is not None and not self._poll_task.done():
+            return
+        self._last_poll = now
+        self._poll_task = asyncio.create_task(self._safe_refresh(database))
+
+    async def _safe_refresh(self, database):
+        try:
+            await self.refresh(database)
+        except Exception as e:
+            print(f"⚠️  Catalog version refresh failed: {e}")
@@ -0,0 +1,99 @@
+from fastapi import HTTPException, status
+from pymongo.errors import DuplicateKeyError
+from datetime import datetime
+from concurrency import single_flight
+import asyncio
+import hashlib
+import json
+import os
+
+IDEMPOTENCY_COLLECTION = "idempotency_keys"
+IDEMPOTENCY_TTL_SECONDS = int(os.environ.get("IDEMPOTENCY_TTL_SECONDS", str(60 * 60 * 24)))
+# How long a request waits for another worker that already claimed the same key
+IDEMPOTENCY_WAIT_SECONDS = float(os.environ.get("IDEMPOTENCY_WAIT_SECONDS", "5"))
+IDEMPOTENCY_POLL_SECONDS = 0.1
+# A pending claim older than this is treated as abandoned by a crashed worker
+IDEMPOTENCY_LEASE_SECONDS = float(os.environ.get("IDEMPOTENCY_LEASE_SECONDS", "60"))
+
+# Requests for the same key inside this worker share one future
+_in_flight = {}
+
+def request_fingerprint(payload) -> str:
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+def _check_fingerprint(stored: str, fingerprint: str):
+    if stored != fingerprint:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Idempotency-Key was already used with a different request"
+        )
+
+async def _wait_for_other_worker(collection, record_id: str, fingerprint: str):
+    deadline = asyncio.get_running_loop().time() + IDEMPOTENCY_WAIT_SECONDS
+    while asyncio.get_running_loop().time() < deadline:
+        await asyncio.sleep(IDEMPOTENCY_POLL_SECONDS)
+        record = await collection.find_one({"_id": record_id})
+        if record is None:
+            # The first attempt failed and released the key
+            return None
+        _check_fingerprint(record.get("fingerprint"), fingerprint)
+        if record["state"] == "done":
+            return record["response"]
+        if (datetime.utcnow() - record["created_at"]).total_seconds() > IDEMPOTENCY_LEASE_SECONDS:
+            await collection.delete_one({"_id": record_id, "state": "pending", "created_at": record["created_at"]})
+            return None
+    raise HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail="A request with this Idempotency-Key is still in progress",
+        headers={"Retry-After": "1"}
+    )
+
+async def _run_once(database, record_id: str, fingerprint: str, handler):
+    collection = database[IDEMPOTENCY_COLLECTION]
+
+    record = await collection.find_one({"_id": record_id})
+    if record is not None:
+        _check_fingerprint(record.get("fingerprint"), fingerprint)
+        if record["state"] == "done":
+            return record["response"]
+
+    try:
+        await collection.insert_one({
+            "_id": record_id,
+            "state": "pending",
+            "fingerprint": fingerprint,
+            "created_at": datetime.utcnow()
+        })
+    except DuplicateKeyError:
+        response = await _wait_for_other_worker(collection, record_id, fingerprint)
+        if response is not None:
+            return response
+        return await _run_once(database, record_id, fingerprint, handler)
+
+    try:
+        response = await handler()
+    except BaseException:
+        await collection.delete_one({"_id": record_id, "state": "pending"})
+        raise
+
+    await collection.update_one(
+        {"_id": record_id},
+        {"$set": {"state": "done", "response": response}}
+    )
+    return response
+
+async def run_idempotent(database, scope: str, key: str, payload, handler):
+    """
+    Run handler() at most once per (scope, key) and replay its stored response
+    for later requests with the same key until the record's TTL expires.
+    """
+    record_id = f"{scope}:{key}"
+    fingerprint = request_fingerprint(payload)
+
+    async def run():
+        return await _run_once(database, record_id, fingerprint, handler), fingerprint
+
+    response, first_fingerprint = await single_flight(_in_flight, record_id, run)
+    # Requests that joined another one's flight must have sent the same payload
+    _check_fingerprint(first_fingerprint, fingerprint)
+    return response
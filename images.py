@@ -0,0 +1,289 @@
+"""
+Uploaded product images and their resized derivatives
+Originals are stored in Mongo under their content hash, so every dyno serves
+them and they survive restarts. Width-bucketed WebP/JPEG derivatives are
+rendered on first request in a bounded process pool and kept in an on-disk LRU
+cache that any dyno can rebuild. Every URL names immutable content, so it can be cached forever.
+    python images.py photo.jpg ...    # store originals and print their URLs
+"""
+import config
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional
+from bson import Binary
+from fastapi import HTTPException, status
+from pymongo.errors import DuplicateKeyError
+from PIL import Image, ImageOps
+from metrics import CallbackMetric, Counter, Histogram
+from concurrency import BoundedPool, single_flight
+import asyncio
+import hashlib
+import io
+import os
+import re
+import sys
+import threading
+
+IMAGE_ORIGINALS_COLLECTION = "image_originals"
+# Local scratch space only: everything in it can be rebuilt from Mongo
+IMAGE_CACHE_DIR = os.environ.get("IMAGE_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "media", "cache"))
+IMAGE_CACHE_MAX_BYTES = int(os.environ.get("IMAGE_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+# Each original is one document, so uploads stay well under Mongo's 16 MB limit
+IMAGE_MAX_UPLOAD_BYTES = min(int(os.environ.get("IMAGE_MAX_UPLOAD_BYTES", str(10 * 1024 * 1024))), 15 * 1024 * 1024)
+IMAGE_POOL_WORKERS = int(os.environ.get("IMAGE_POOL_WORKERS", str(min(2, os.cpu_count() or 1))))
+IMAGE_POOL_MAX_PENDING = int(os.environ.get("IMAGE_POOL_MAX_PENDING", str(IMAGE_POOL_WORKERS * 8)))
+
+# Requested widths are rounded up to one of these, so each original has at most
+# len(IMAGE_WIDTHS) * len(DERIVATIVE_FORMATS) derivatives
+IMAGE_WIDTHS = (160, 320, 480, 800, 1200)
+DERIVATIVE_FORMATS = {"webp": ("WEBP", "image/webp", 80), "jpg": ("JPEG", "image/jpeg", 82)}
+# Pillow format -> (file extension, media type) for accepted uploads
+ORIGINAL_FORMATS = {"JPEG": ("jpg", "image/jpeg"), "PNG": ("png", "image/png"), "WEBP": ("webp", "image/webp"), "GIF": ("gif", "image/gif")}
+ORIGINAL_MEDIA_TYPES = {extension: media_type for extension, media_type in ORIGINAL_FORMATS.values()}
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+IMAGE_URL_PREFIX = "/api/images/"
+_LOCAL_IMAGE_URL = re.compile(r"^/api/images/([0-9a-f]{32})\.(jpg|png|webp|gif)$")
+
+def width_bucket(width: int) -> int:
+    for bucket in IMAGE_WIDTHS:
+        if width <= bucket:
+            return bucket
+    return IMAGE_WIDTHS[-1]
+
+def image_id_from_url(url: str) -> Optional[str]:
+    match = _LOCAL_IMAGE_URL.match(url or "")
+    return match.group(1) if match else None
+
+def derivative_url(image_id: str, width: int, extension: str = "webp") -> str:
+    return f"{IMAGE_URL_PREFIX}{image_id}/w{width}.{extension}"
+
+def image_variants(url: str) -> dict:
+    """{width: WebP URL} for an uploaded image; empty for remote URLs."""
+    image_id = image_id_from_url(url)
+    if image_id is None:
+        return {}
+    return {str(width): derivative_url(image_id, width) for width in IMAGE_WIDTHS}
+
+def _write_atomic(path: str, data: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    # Readers in other workers see either nothing or the whole file
+    os.replace(tmp, path)
+
+# These run in the process pool
+
+def inspect_upload(data: bytes) -> str:
+    with Image.open(io.BytesIO(data)) as image:
+        image.verify()
+        return image.format
+
+def render_derivative(original: bytes, width: int, extension: str) -> bytes:
+    pil_format, _, quality = DERIVATIVE_FORMATS[extension]
+    with Image.open(io.BytesIO(original)) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.width > width:
+            # Only ever scale down; small originals keep their size
+            image = image.resize((width, max(1, round(image.height * width / image.width))), Image.LANCZOS)
+        if pil_format == "JPEG":
+            image = image.convert("RGB")
+        elif image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if image.mode in ("P", "LA", "PA") else "RGB")
+        options = {"optimize": True} if pil_format == "JPEG" else {"method": 4}
+        buffer = io.BytesIO()
+        image.save(buffer, pil_format, quality=quality, **options)
+        return buffer.getvalue()
+
+class DerivativeCache:
+    """
+    Rendered derivatives (and recently served originals) on disk, evicted least-recently-used once their total
+    size passes max_bytes. Files written by other workers are adopted on first
+    read; each worker evicts against its own view, so the limit is approximate.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._loaded = False
+
+    def _load(self):
+        # Oldest first, so files left from a previous run are evicted before new ones
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            names = []
+        files = []
+        for name in names:
+            if name.endswith(".tmp"):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, name, stat.st_size))
+        for _, name, size in sorted(files):
+            self._entries[name] = size
+            self.total_bytes += size
+        self._loaded = True
+
+    def _evict(self):
+        while self.total_bytes > self.max_bytes and self._entries:
+            name, size = self._entries.popitem(last=False)
+            self.total_bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+
+    def get(self, name: str) -> Optional[bytes]:
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            try:
+                with open(os.path.join(self.directory, name), "rb") as f:
+                    data = f.read()
+            except FileNotFoundError:
+                size = self._entries.pop(name, None)
+                if size is not None:
+                    self.total_bytes -= size
+                self.misses += 1
+                return None
+            if name not in self._entries:
+                self.total_bytes += len(data)
+            self._entries[name] = len(data)
+            self._entries.move_to_end(name)
+            self.hits += 1
+            self._evict()
+            return data
+
+    def put(self, name: str, data: bytes):
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            _write_atomic(os.path.join(self.directory, name), data)
+            self.total_bytes += len(data) - self._entries.get(name, 0)
+            self._entries[name] = len(data)
+            self._entries.move_to_end(name)
+            self._evict()
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+image_render_duration = Histogram("image_render_duration_seconds", "Queue wait plus decode/resize time", ("operation",))
+image_pool = BoundedPool("process", IMAGE_POOL_WORKERS, IMAGE_POOL_MAX_PENDING, latency=image_render_duration)
+derivative_cache = DerivativeCache(IMAGE_CACHE_DIR, IMAGE_CACHE_MAX_BYTES)
+
+image_uploads = Counter("image_uploads_total", "Uploaded image originals", ("outcome",))
+CallbackMetric(
+    "image_derivative_cache_events_total", "Derivative cache lookups and evictions", "counter",
+    lambda: {"hit": derivative_cache.hits, "miss": derivative_cache.misses, "eviction": derivative_cache.evictions},
+    ("event",)
+)
+CallbackMetric("image_derivative_cache_bytes", "Bytes held in the derivative cache", "gauge", lambda: derivative_cache.total_bytes)
+
+# Concurrent requests for the same missing derivative share one render
+_rendering = {}
+
+async def store_original(database, data: bytes) -> dict:
+    if len(data) > IMAGE_MAX_UPLOAD_BYTES:
+        image_uploads.inc(("rejected",))
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Images are limited to {IMAGE_MAX_UPLOAD_BYTES} bytes"
+        )
+    try:
+        pil_format = await image_pool.run(inspect_upload, data)
+    except HTTPException:
+        raise
+    except Exception:
+        pil_format = None
+    if pil_format not in ORIGINAL_FORMATS:
+        image_uploads.inc(("rejected",))
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported image; expected one of {', '.join(sorted(ORIGINAL_FORMATS))}"
+        )
+
+    image_id = hashlib.sha256(data).hexdigest()[:32]
+    extension, _ = ORIGINAL_FORMATS[pil_format]
+    try:
+        # Same bytes, same id: re-uploads leave the stored original untouched
+        await database[IMAGE_ORIGINALS_COLLECTION].update_one(
+            {"_id": image_id},
+            {"$setOnInsert": {"extension": extension, "data": Binary(data), "size": len(data), "created_at": datetime.utcnow()}},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        # A concurrent upload of the same image got there first
+        pass
+    image_uploads.inc(("stored",))
+
+    url = f"{IMAGE_URL_PREFIX}{image_id}.{extension}"
+    return {"id": image_id, "url": url, "variants": image_variants(url)}
+
+async def _load_original(database, image_id: str) -> Optional[dict]:
+    return await database[IMAGE_ORIGINALS_COLLECTION].find_one({"_id": image_id}, {"extension": 1, "data": 1})
+
+async def read_original(database, image_id: str, extension: str) -> Optional[bytes]:
+    name = f"{image_id}.{extension}"
+    data = await asyncio.to_thread(derivative_cache.get, name)
+    if data is not None:
+        return data
+
+    original = await _load_original(database, image_id)
+    if original is None or original["extension"] != extension:
+        return None
+    data = bytes(original["data"])
+    await asyncio.to_thread(derivative_cache.put, name, data)
+    return data
+
+async def get_derivative(database, image_id: str, width: int, extension: str) -> Optional[bytes]:
+    """Bytes of the derivative, rendering and caching it on first request; None if the original is unknown."""
+    width = width_bucket(width)
+    name = f"{image_id}-w{width}.{extension}"
+
+    data = await asyncio.to_thread(derivative_cache.get, name)
+    if data is not None:
+        return data
+
+    async def render():
+        original = await _load_original(database, image_id)
+        if original is None:
+            return None
+        data = await image_pool.run(render_derivative, bytes(original["data"]), width, extension)
+        await asyncio.to_thread(derivative_cache.put, name, data)
+        return data
+
+    return await single_flight(_rendering, name, render)
+
+async def main(paths: list):
+    from database import db
+
+    await db.connect_db()
+    for path in paths:
+        with open(path, "rb") as f:
+            stored = await store_original(db.get_db(), f.read())
+        print(f"✅ {path} -> {stored['url']}")
+    image_pool.shutdown()
+    await db.close_db()
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        raise SystemExit("Usage: python images.py <image> [<image> ...]")
+    asyncio.run(main(sys.argv[1:]))
@@ -0,0 +1,124 @@
+"""
+Declared MongoDB indexes and a query-plan checker
+Run `python indexes.py` to build the indexes and flag any route query that still scans a collection
+"""
+import config
+import asyncio
+from datetime import datetime
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+from pymongo.errors import OperationFailure
+from idempotency import IDEMPOTENCY_TTL_SECONDS
+from jobs import JOB_RETENTION_SECONDS
+
+ORDER_INDEXES = [
+    IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], name="user_created"),
+    IndexModel([("status", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], name="status_created"),
+    IndexModel([("created_at", DESCENDING), ("_id", DESCENDING)], name="created"),
+    IndexModel([("order_number", ASCENDING)], name="order_number_unique", unique=True),
+]
+
+INDEXES = {
+    "users": [
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+    ],
+    "orders": ORDER_INDEXES,
+    # Archived orders are read with the same query shapes as hot ones
+    "orders_archive": ORDER_INDEXES,
+    "products": [
+        IndexModel([("category", ASCENDING), ("_id", ASCENDING)], name="category_id"),
+        IndexModel([("sku", ASCENDING)], name="sku_unique", unique=True, partialFilterExpression={"sku": {"$type": "string"}}),
+        IndexModel([("name", ASCENDING)], name="name"),
+        IndexModel(
+            [("name", TEXT), ("description", TEXT), ("fragrance_notes", TEXT)],
+            name="search_text",
+            weights={"name": 10, "fragrance_notes": 5, "description": 1},
+        ),
+        IndexModel([("wax_type", ASCENDING), ("price", ASCENDING)], name="wax_type_price"),
+        IndexModel([("price", ASCENDING)], name="price"),
+        IndexModel([("rating", DESCENDING)], name="rating"),
+    ],
+    "idempotency_keys": [
+        IndexModel([("created_at", ASCENDING)], name="created_ttl", expireAfterSeconds=IDEMPOTENCY_TTL_SECONDS),
+    ],
+    "revoked_tokens": [
+        IndexModel([("expires_at", ASCENDING)], name="expires_ttl", expireAfterSeconds=0),
+        IndexModel([("revoked_at", ASCENDING)], name="revoked_at"),
+    ],
+    "jobs": [
+        IndexModel([("state", ASCENDING), ("run_at", ASCENDING)], name="state_run_at"),
+        IndexModel([("state", ASCENDING), ("lease_until", ASCENDING)], name="state_lease_until"),
+        IndexModel(
+            [("finished_at", ASCENDING)], name="finished_ttl", expireAfterSeconds=JOB_RETENTION_SECONDS,
+            partialFilterExpression={"state": "done"}
+        ),
+    ],
+    "rate_limits": [
+        IndexModel([("expires_at", ASCENDING)], name="expires_ttl", expireAfterSeconds=0),
+    ],
+    "sales_rollups": [
+        IndexModel([("day", ASCENDING), ("dimension", ASCENDING)], name="day_dimension"),
+    ],
+}
+
+async def ensure_indexes(database):
+    """Create every declared index. Safe to call on each startup."""
+    for collection_name, indexes in INDEXES.items():
+        for index in indexes:
+            try:
+                await database[collection_name].create_indexes([index])
+            except OperationFailure as e:
+                # Keep serving even if e.g. duplicate emails block a unique index
+                print(f"⚠️  Could not create index {index.document['name']} on {collection_name}: {e}")
+
+# One entry per query shape issued by the routes: (label, collection, filter, sort)
+QUERY_SHAPES = [
+    ("users by email", "users", {"email": "probe@example.com"}, None),
+    ("my orders", "orders", {"user_id": ObjectId()}, [("created_at", -1), ("_id", -1)]),
+    ("orders by status", "orders", {"status": "pending"}, [("created_at", -1), ("_id", -1)]),
+    ("all orders", "orders", {"created_at": {"$lt": datetime.utcnow()}}, [("created_at", -1), ("_id", -1)]),
+    ("order by id", "orders", {"_id": ObjectId()}, None),
+    ("archived orders to move", "orders", {"status": {"$in": ["delivered", "cancelled"]}, "created_at": {"$lt": datetime.utcnow()}}, [("created_at", 1)]),
+    ("my archived orders", "orders_archive", {"user_id": ObjectId()}, [("created_at", -1), ("_id", -1)]),
+    ("products by category", "products", {"category": "floral"}, [("_id", 1)]),
+    ("product by id", "products", {"_id": ObjectId()}, None),
+    ("due jobs", "jobs", {"state": "queued", "run_at": {"$lte": datetime.utcnow()}}, [("run_at", 1)]),
+]
+
+def _plan_stages(plan):
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from _plan_stages(value)
+    elif isinstance(plan, list):
+        for value in plan:
+            yield from _plan_stages(value)
+
+async def check_query_plans(database) -> list:
+    """Explain each route query shape and return the labels of those that COLLSCAN."""
+    collscans = []
+    for label, collection_name, query, sort in QUERY_SHAPES:
+        cursor = database[collection_name].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        explain = await cursor.limit(1).explain()
+        stages = set(_plan_stages(explain.get("queryPlanner", {}).get("winningPlan", {})))
+        if "COLLSCAN" in stages:
+            collscans.append(label)
+            print(f"❌ {label}: COLLSCAN on {collection_name}")
+        else:
+            print(f"✅ {label}: {', '.join(sorted(stages))}")
+    return collscans
+
+async def main():
+    from database import db
+
+    await db.connect_db()
+    collscans = await check_query_plans(db.get_db())
+    await db.close_db()
+    if collscans:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -3,12 +3,10 @@ Initialize database with products and admin user
 Run this script once to populate the database
 """
 import asyncio
+import config
 from motor.motor_asyncio import AsyncIOMotorClient
 from auth import get_password_hash
 import os
-from dotenv import load_dotenv
-
-load_dotenv()
 
 MONGO_URL = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
 DB_NAME = "handmade_glow_db"
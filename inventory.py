@@ -0,0 +1,89 @@
+from typing import Optional
+from pymongo import ReturnDocument, UpdateOne
+import asyncio
+
+# Products with stock = None are not tracked and never run out.
+# For tracked products in_stock is kept in sync with the remaining count.
+
+def _stock_update(delta: int) -> list:
+    remaining = {"$add": ["$stock", delta]}
+    return [{"$set": {"stock": remaining, "in_stock": {"$gt": [remaining, 0]}}}]
+
+async def _reserve_one(database, product_id, quantity: int) -> Optional[int]:
+    """Stock left after taking quantity, or None if there wasn't enough."""
+    reserved = await database.products.find_one_and_update(
+        {"_id": product_id, "stock": {"$gte": quantity}},
+        _stock_update(-quantity),
+        projection={"stock": 1},
+        return_document=ReturnDocument.AFTER
+    )
+    return None if reserved is None else reserved["stock"]
+
+def _reserved(result) -> bool:
+    return result is not None and not isinstance(result, BaseException)
+
+async def reserve_stock(database, quantities: dict):
+    """
+    Atomically decrement stock for every {product_id: quantity}. Each item is a
+    guarded find_one_and_update, all issued concurrently, so the cost is about one
+    round trip and every item reports whether it was reserved. Returns the product
+    ids that were short and, when none were, {product_id: stock left}; on any
+    shortfall, error or cancellation the items that did succeed are released
+    again, so nothing stays reserved.
+    """
+    if not quantities:
+        return [], {}
+
+    product_ids = list(quantities)
+    tasks = [
+        asyncio.ensure_future(_reserve_one(database, product_id, quantities[product_id]))
+        for product_id in product_ids
+    ]
+    try:
+        results = await asyncio.shield(asyncio.gather(*tasks, return_exceptions=True))
+    except asyncio.CancelledError:
+        # Updates already sent may still land; wait them out and undo them even
+        # though the caller has gone
+        await asyncio.shield(_release_reserved(database, quantities, product_ids, tasks))
+        raise
+
+    short = [product_id for product_id, result in zip(product_ids, results) if not _reserved(result)]
+    if not short:
+        return [], dict(zip(product_ids, results))
+
+    await _release_reserved(database, quantities, product_ids, tasks)
+    errors = [result for result in results if isinstance(result, BaseException)]
+    if errors:
+        raise errors[0]
+    return short, {}
+
+async def _release_reserved(database, quantities: dict, product_ids: list, tasks: list):
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    await release_stock(database, {
+        product_id: quantities[product_id]
+        for product_id, result in zip(product_ids, results)
+        if _reserved(result)
+    })
+
+async def release_stock(database, quantities: dict):
+    if not quantities:
+        return
+    # Skips products whose tracking was switched off since the reservation
+    ops = [
+        UpdateOne({"_id": product_id, "stock": {"$type": "number"}}, _stock_update(quantity))
+        for product_id, quantity in quantities.items()
+    ]
+    await database.products.bulk_write(ops, ordered=False)
+
+def reserved_stock_record(quantities: dict) -> list:
+    """What an order stores about its reservation, so cancelling can give it back."""
+    return [{"product_id": product_id, "quantity": quantity} for product_id, quantity in quantities.items()]
+
+async def release_order_stock(database, orders: list) -> bool:
+    """Return the stock reserved by each order; True if anything was released."""
+    quantities = {}
+    for order in orders:
+        for item in order.get("reserved_stock") or []:
+            quantities[item["product_id"]] = quantities.get(item["product_id"], 0) + item["quantity"]
+    await release_stock(database, quantities)
+    return bool(quantities)
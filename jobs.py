@@ -0,0 +1,218 @@
+"""
+Durable background jobs kept in the jobs collection
+Routes enqueue and return; workers lease jobs with find_one_and_update, retry
+failures with exponential backoff and park jobs that keep failing as "dead".
+    python jobs.py            # run a standalone worker pool next to the web workers
+    python jobs.py --drain    # run everything that is due, then exit
+"""
+import config
+from datetime import datetime, timedelta
+from pymongo import ReturnDocument
+from metrics import Counter, Histogram
+import asyncio
+import os
+import socket
+import sys
+import time
+import traceback
+
+JOBS_COLLECTION = "jobs"
+# Workers started inside each web worker; 0 leaves the jobs to `python jobs.py`
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "2"))
+JOB_POLL_SECONDS = float(os.environ.get("JOB_POLL_SECONDS", "1"))
+# A running job whose lease lapses (worker crashed) is picked up again
+JOB_LEASE_SECONDS = float(os.environ.get("JOB_LEASE_SECONDS", "60"))
+# On shutdown, how long running jobs get to finish before they are cancelled
+JOB_STOP_SECONDS = float(os.environ.get("JOB_STOP_SECONDS", "10"))
+JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", "5"))
+JOB_BACKOFF_SECONDS = float(os.environ.get("JOB_BACKOFF_SECONDS", "2"))
+JOB_MAX_BACKOFF_SECONDS = float(os.environ.get("JOB_MAX_BACKOFF_SECONDS", "600"))
+# Finished jobs are removed by a TTL index; dead ones stay for inspection
+JOB_RETENTION_SECONDS = int(os.environ.get("JOB_RETENTION_SECONDS", str(60 * 60 * 24 * 7)))
+
+jobs_processed = Counter("jobs_processed_total", "Background jobs run, by kind and outcome", ("kind", "outcome"))
+job_duration = Histogram("job_duration_seconds", "Background job run time", ("kind",))
+
+_handlers = {}
+
+def job_handler(kind: str):
+    """
+    Register `async def handler(database, payload, job_id)` for jobs of this kind.
+    A job can run more than once (lapsed lease, failed "done" write), so handlers
+    must be idempotent; job_id stays the same across runs and retries.
+    """
+    def register(fn):
+        _handlers[kind] = fn
+        return fn
+    return register
+
+def backoff_seconds(attempts: int) -> float:
+    return min(JOB_MAX_BACKOFF_SECONDS, JOB_BACKOFF_SECONDS * 2 ** (attempts - 1))
+
+class JobQueue:
+    def __init__(self, workers: int = JOB_WORKERS):
+        self.workers = workers
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._wakeup = None
+        self._stopping = False
+        self._tasks = []
+
+    async def enqueue(self, database, kind: str, payload: dict, delay_seconds: float = 0, max_attempts: int = JOB_MAX_ATTEMPTS):
+        await self.enqueue_many(database, kind, [payload], delay_seconds, max_attempts)
+
+    async def enqueue_many(self, database, kind: str, payloads: list, delay_seconds: float = 0, max_attempts: int = JOB_MAX_ATTEMPTS):
+        if not payloads:
+            return
+        now = datetime.utcnow()
+        await database[JOBS_COLLECTION].insert_many([
+            {
+                "kind": kind,
+                "payload": payload,
+                "state": "queued",
+                "attempts": 0,
+                "max_attempts": max_attempts,
+                "run_at": now + timedelta(seconds=delay_seconds),
+                "created_at": now,
+                "updated_at": now
+            }
+            for payload in payloads
+        ], ordered=False)
+        if self._wakeup is not None and not delay_seconds:
+            self._wakeup.set()
+
+    async def lease(self, database):
+        now = datetime.utcnow()
+        return await database[JOBS_COLLECTION].find_one_and_update(
+            {"$or": [
+                {"state": "queued", "run_at": {"$lte": now}},
+                {"state": "running", "lease_until": {"$lte": now}},
+            ]},
+            {
+                "$set": {
+                    "state": "running",
+                    "lease_until": now + timedelta(seconds=JOB_LEASE_SECONDS),
+                    "worker": self.worker_id,
+                    "updated_at": now
+                },
+                "$inc": {"attempts": 1}
+            },
+            sort=[("run_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def run_job(self, database, job):
+        kind = job["kind"]
+        collection = database[JOBS_COLLECTION]
+        # Only the worker holding the current lease may settle the job
+        owner = {"_id": job["_id"], "state": "running", "lease_until": job["lease_until"]}
+
+        handler = _handlers.get(kind)
+        started = time.perf_counter()
+        try:
+            if handler is None:
+                raise LookupError(f"No handler registered for job kind {kind!r}")
+            await handler(database, job["payload"], job["_id"])
+        except Exception as e:
+            now = datetime.utcnow()
+            error = "".join(traceback.format_exception_only(type(e), e)).strip()
+            if job["attempts"] >= job.get("max_attempts", JOB_MAX_ATTEMPTS):
+                update = {"state": "dead", "last_error": error, "updated_at": now}
+                outcome = "dead"
+                print(f"⚠️  Job {job['_id']} ({kind}) failed permanently: {error}")
+            else:
+                retry_at = now + timedelta(seconds=backoff_seconds(job["attempts"]))
+                update = {"state": "queued", "run_at": retry_at, "last_error": error, "updated_at": now}
+                outcome = "retry"
+            await collection.update_one(owner, {"$set": update, "$unset": {"lease_until": ""}})
+        else:
+            now = datetime.utcnow()
+            await collection.update_one(
+                owner,
+                {"$set": {"state": "done", "finished_at": now, "updated_at": now}, "$unset": {"lease_until": ""}}
+            )
+            outcome = "success"
+        finally:
+            job_duration.observe((kind,), time.perf_counter() - started)
+        jobs_processed.inc((kind, outcome))
+        return outcome
+
+    async def run_pending(self, database) -> int:
+        """Run every job that is due now in this task and return how many ran."""
+        ran = 0
+        while True:
+            job = await self.lease(database)
+            if job is None:
+                return ran
+            await self.run_job(database, job)
+            ran += 1
+
+    async def _worker(self, database):
+        while not self._stopping:
+            try:
+                job = await self.lease(database)
+                if job is not None:
+                    await self.run_job(database, job)
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️  Job worker error: {e}")
+
+            if self._stopping:
+                return
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), JOB_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self, database):
+        if self._tasks or self.workers <= 0:
+            return
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._tasks = [asyncio.create_task(self._worker(database)) for _ in range(self.workers)]
+        print(f"Started {self.workers} job worker(s)")
+
+    async def stop(self):
+        # Workers finish the job in hand and take no new one
+        self._stopping = True
+        if self._wakeup is not None:
+            self._wakeup.set()
+        done, running = await asyncio.wait(self._tasks, timeout=JOB_STOP_SECONDS) if self._tasks else (set(), set())
+        # A job cut off past the deadline keeps its lease and is retried once it lapses
+        for task in running:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._wakeup = None
+
+job_queue = JobQueue()
+
+async def main():
+    # Use the importable module's queue, where order_jobs registers its handlers
+    from database import db
+    from jobs import job_queue
+    import order_jobs
+
+    await db.connect_db()
+    database = db.get_db()
+    if "--drain" in sys.argv:
+        ran = await job_queue.run_pending(database)
+        print(f"✅ Ran {ran} job(s)")
+        await db.close_db()
+        return
+
+    job_queue.workers = max(1, job_queue.workers)
+    job_queue.start(database)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await job_queue.stop()
+        await db.close_db()
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,247 @@
+"""
+Minimal Prometheus metrics: an in-process registry, an ASGI middleware for
+per-route request latency and pymongo listeners for command and pool timings
+"""
+from bisect import bisect_left
+from pymongo import monitoring
+import threading
+import time
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+MONGO_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+
+_registry = []
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names, values, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value) -> str:
+    if isinstance(value, float) and value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _header(self) -> list:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+
+    def inc(self, labels: tuple = (), amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def collect(self) -> list:
+        lines = self._header()
+        with self._lock:
+            values = list(self._values.items())
+        for labels, value in values:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, labels: tuple = (), amount: float = 1):
+        self.inc(labels, -amount)
+
+    def set(self, labels: tuple = (), value: float = 0):
+        with self._lock:
+            self._values[labels] = value
+
+    def value(self, labels: tuple = ()) -> float:
+        return self._values.get(labels, 0)
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts..., +Inf count, sum]
+        self._values = {}
+
+    def observe(self, labels: tuple, value: float):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(labels)
+            if series is None:
+                series = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def collect(self) -> list:
+        lines = self._header()
+        with self._lock:
+            values = [(labels, list(series)) for labels, series in self._values.items()]
+        for labels, series in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {_format_value(series[-1])}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+class CallbackMetric(_Metric):
+    """Reads its value(s) at scrape time, for stats kept elsewhere (caches, pools)."""
+
+    def __init__(self, name, documentation, kind: str, callback, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self.kind = kind
+        self.callback = callback
+
+    def collect(self) -> list:
+        lines = self._header()
+        value = self.callback()
+        items = value.items() if isinstance(value, dict) else [((), value)]
+        for labels, sample in items:
+            labels = labels if isinstance(labels, tuple) else (labels,)
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(sample)}")
+        return lines
+
+def render() -> str:
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.collect())
+    return "\n".join(lines) + "\n"
+
+# HTTP
+
+http_request_duration = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template",
+    ("method", "route", "status")
+)
+http_requests_in_flight = Gauge("http_requests_in_flight", "HTTP requests currently being served")
+
+class PrometheusMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        http_requests_in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_requests_in_flight.dec()
+            # Label by template, never the raw path, to keep cardinality bounded
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            http_request_duration.observe(
+                (scope["method"], route_path, str(status_code)), time.perf_counter() - started
+            )
+
+# MongoDB
+
+mongo_command_duration = Histogram(
+    "mongodb_command_duration_seconds", "MongoDB command latency by collection and command",
+    ("collection", "command", "outcome"), buckets=MONGO_BUCKETS
+)
+mongo_pool_checkout_wait = Histogram(
+    "mongodb_pool_checkout_wait_seconds", "Time spent waiting to check a connection out of the pool",
+    ("outcome",), buckets=MONGO_BUCKETS
+)
+mongo_pool_connections = Gauge("mongodb_pool_connections", "Open pooled MongoDB connections")
+mongo_pool_in_use = Gauge("mongodb_pool_connections_in_use", "Pooled MongoDB connections checked out")
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    def __init__(self):
+        self._collections = {}
+
+    def started(self, event):
+        if event.command_name == "getMore":
+            target = event.command.get("collection")
+        else:
+            target = event.command.get(event.command_name)
+        collection = target if isinstance(target, str) else event.database_name
+        self._collections[(event.request_id, event.connection_id)] = collection
+
+    def _record(self, event, outcome: str):
+        collection = self._collections.pop((event.request_id, event.connection_id), "")
+        mongo_command_duration.observe(
+            (collection, event.command_name, outcome), event.duration_micros / 1_000_000
+        )
+
+    def succeeded(self, event):
+        self._record(event, "success")
+
+    def failed(self, event):
+        self._record(event, "failure")
+
+class MongoPoolMetrics(monitoring.ConnectionPoolListener):
+    # Checkout start and finish happen on the same pymongo thread
+    _checkout = threading.local()
+
+    def connection_check_out_started(self, event):
+        self._checkout.started = time.perf_counter()
+
+    def _record_checkout(self, outcome: str):
+        started = getattr(self._checkout, "started", None)
+        if started is not None:
+            mongo_pool_checkout_wait.observe((outcome,), time.perf_counter() - started)
+            self._checkout.started = None
+
+    def connection_checked_out(self, event):
+        self._record_checkout("success")
+        mongo_pool_in_use.inc()
+
+    def connection_checked_in(self, event):
+        mongo_pool_in_use.dec()
+
+    def connection_check_out_failed(self, event):
+        self._record_checkout("failure")
+
+    def connection_created(self, event):
+        mongo_pool_connections.inc()
+
+    def connection_closed(self, event):
+        mongo_pool_connections.dec()
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr, Field
-from typing import Optional, List
+from typing import Dict, Optional, List, Literal, Union
 from datetime import datetime
 from bson import ObjectId
 
@@ -47,6 +47,7 @@ class UserUpdate(BaseModel):
 
 # Product Models
 class Product(BaseModel):
+    sku: Optional[str] = None
     name: str
     category: str
     price: int
@@ -62,16 +63,19 @@ class Product(BaseModel):
     rating: float = 4.5
     reviews: int = 0
     in_stock: bool = True
+    stock: Optional[int] = Field(None, ge=0)
     featured: bool = False
     bestseller: bool = False
 
 class ProductResponse(BaseModel):
     id: str
+    sku: Optional[str] = None
     name: str
     category: str
     price: int
     original_price: Optional[int] = None
     image: str
+    image_variants: Dict[str, str] = {}
     images: List[str] = []
     description: str
     details: str
@@ -82,18 +86,57 @@ class ProductResponse(BaseModel):
     rating: float
     reviews: int
     in_stock: bool
+    stock: Optional[int] = None
     featured: bool
     bestseller: bool
 
     class Config:
         json_encoders = {ObjectId: str}
 
+class ProductPage(BaseModel):
+    items: List[ProductResponse]
+    next_cursor: Optional[str] = None
+
+class ProductSummary(BaseModel):
+    id: str
+    name: str
+    category: str
+    price: int
+    original_price: Optional[int] = None
+    image: str
+    image_variants: Dict[str, str] = {}
+    rating: float
+    in_stock: bool
+
+class ProductSummaryPage(BaseModel):
+    items: List[ProductSummary]
+    next_cursor: Optional[str] = None
+
+class FacetCount(BaseModel):
+    value: Union[str, bool, None]
+    count: int
+
+class PriceFacet(BaseModel):
+    min: Union[int, str]
+    count: int
+
+class ProductSearchFacets(BaseModel):
+    category: List[FacetCount]
+    wax_type: List[FacetCount]
+    in_stock: List[FacetCount]
+    price: List[PriceFacet]
+
+class ProductSearchResult(BaseModel):
+    items: Union[List[ProductResponse], List[ProductSummary]]
+    total: int
+    facets: ProductSearchFacets
+
 # Order Models
 class OrderItem(BaseModel):
     product_id: str
     name: str
     price: int
-    quantity: int
+    quantity: int = Field(..., gt=0)
     image: str
 
 class ShippingAddress(BaseModel):
@@ -126,8 +169,18 @@ class OrderResponse(BaseModel):
     class Config:
         json_encoders = {ObjectId: str}
 
+class OrderPage(BaseModel):
+    items: List[OrderResponse]
+    next_cursor: Optional[str] = None
+
+OrderStatus = Literal["pending", "confirmed", "shipped", "delivered", "cancelled"]
+
 class OrderStatusUpdate(BaseModel):
-    status: str
+    status: OrderStatus
+
+class BulkOrderStatusUpdate(BaseModel):
+    order_ids: List[str]
+    status: OrderStatus
 
 # Token Models
 class Token(BaseModel):
@@ -136,4 +189,10 @@ class Token(BaseModel):
 
 class TokenData(BaseModel):
     email: Optional[str] = None
-    is_admin: bool = False
\ No newline at end of file
+    user_id: Optional[str] = None
+    is_admin: bool = False
+    jti: Optional[str] = None
+    exp: Optional[int] = None
+
+class UserRoleUpdate(BaseModel):
+    is_admin: bool
\ No newline at end of file
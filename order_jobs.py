@@ -0,0 +1,43 @@
+"""
+Post-checkout work run by the job queue instead of inline in the order routes
+"""
+from jobs import job_handler, job_queue
+from rollups import record_order_created, record_status_change
+
+ORDER_CREATED_JOB = "order.created"
+ORDER_STATUS_CHANGED_JOB = "order.status_changed"
+
+def _rollup_snapshot(order) -> dict:
+    # Just what the rollups need, so the job never re-reads the order
+    return {
+        "order_id": order["_id"],
+        "created_at": order["created_at"],
+        "status": order["status"],
+        "total": order["total"],
+        "items": [
+            {"product_id": item["product_id"], "name": item["name"], "price": item["price"], "quantity": item["quantity"]}
+            for item in order["items"]
+        ]
+    }
+
+async def enqueue_order_created(database, order):
+    await job_queue.enqueue(database, ORDER_CREATED_JOB, {"order": _rollup_snapshot(order)})
+
+async def enqueue_status_change(database, order, old_status: str, new_status: str):
+    await enqueue_status_changes(database, [(order, old_status)])
+
+async def enqueue_status_changes(database, changes: list):
+    """Queue rollup updates for [(order, old_status)], one insert for the lot."""
+    await job_queue.enqueue_many(database, ORDER_STATUS_CHANGED_JOB, [
+        {"order": _rollup_snapshot(order), "old_status": old_status, "new_status": order["status"]}
+        for order, old_status in changes
+        if old_status != order["status"]
+    ])
+
+@job_handler(ORDER_CREATED_JOB)
+async def handle_order_created(database, payload, job_id):
+    await record_order_created(database, payload["order"], op_id=job_id)
+
+@job_handler(ORDER_STATUS_CHANGED_JOB)
+async def handle_status_changed(database, payload, job_id):
+    await record_status_change(database, payload["order"], payload["old_status"], payload["new_status"], op_id=job_id)
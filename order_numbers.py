@@ -0,0 +1,45 @@
+from pymongo import ReturnDocument
+import asyncio
+import os
+
+COUNTERS_COLLECTION = "counters"
+ORDER_NUMBER_COUNTER = "order_number"
+ORDER_NUMBER_BLOCK_SIZE = int(os.environ.get("ORDER_NUMBER_BLOCK_SIZE", "50"))
+
+def format_order_number(value: int) -> str:
+    # Zero-padded so order numbers sort the same as strings and as integers
+    return f"ORD-{value:08d}"
+
+class OrderNumberAllocator:
+    """
+    Hands out unique order numbers from a block reserved with one atomic $inc.
+    Each worker holds its own block, so numbers are unique across workers and
+    increasing within a worker; a restart leaves the unused tail of a block as a gap.
+    """
+
+    def __init__(self, block_size: int = ORDER_NUMBER_BLOCK_SIZE):
+        self.block_size = block_size
+        self._next = 1
+        self._end = 0
+        self._lock = asyncio.Lock()
+
+    async def _reserve_block(self, database):
+        counter = await database[COUNTERS_COLLECTION].find_one_and_update(
+            {"_id": ORDER_NUMBER_COUNTER},
+            {"$inc": {"seq": self.block_size}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        self._end = counter["seq"]
+        self._next = self._end - self.block_size + 1
+
+    async def next(self, database) -> str:
+        if self._next > self._end:
+            async with self._lock:
+                if self._next > self._end:
+                    await self._reserve_block(database)
+        value = self._next
+        self._next += 1
+        return format_order_number(value)
+
+order_number_allocator = OrderNumberAllocator()
@@ -0,0 +1,89 @@
+"""
+Order status state machine and bulk status transitions
+"""
+from datetime import datetime
+from bson import ObjectId
+from pymongo import UpdateOne
+
+# Forward along the fulfilment chain, or cancel before the order has shipped
+ORDER_TRANSITIONS = {
+    "pending": {"confirmed", "cancelled"},
+    "confirmed": {"shipped", "cancelled"},
+    "shipped": {"delivered"},
+    "delivered": set(),
+    "cancelled": set(),
+}
+
+BULK_STATUS_MAX_ORDERS = 1000
+
+# Everything the rollup jobs and stock release need from an order, plus its current status
+TRANSITION_PROJECTION = {"status": 1, "total": 1, "items": 1, "created_at": 1, "reserved_stock": 1}
+
+def can_transition(old_status: str, new_status: str) -> bool:
+    return new_status in ORDER_TRANSITIONS.get(old_status, ())
+
+def statuses_leading_to(new_status: str) -> list:
+    return [old for old, targets in ORDER_TRANSITIONS.items() if new_status in targets]
+
+async def transition_orders(database, order_ids: list, new_status: str):
+    """
+    Move every order in order_ids to new_status with one $in read and one
+    unordered bulk_write. Each write is guarded on the status that was read,
+    so an order changed concurrently is reported as a conflict, not overwritten.
+    Returns (per-order results in request order, [(order, old_status)] that changed).
+    """
+    order_ids = list(dict.fromkeys(order_ids))
+    object_ids = [ObjectId(order_id) for order_id in order_ids if ObjectId.is_valid(order_id)]
+    orders = await database.orders.find({"_id": {"$in": object_ids}}, TRANSITION_PROJECTION).to_list(None)
+    orders = {str(order["_id"]): order for order in orders}
+
+    # Mongo keeps milliseconds, so returned orders match later reads
+    now = datetime.utcnow()
+    now = now.replace(microsecond=now.microsecond // 1000 * 1000)
+    # Tags this request's writes; two requests in the same millisecond could
+    # otherwise both claim one order and release its stock twice
+    transition_id = ObjectId()
+
+    results = {}
+    ops = []
+    pending = []
+    for order_id in order_ids:
+        order = orders.get(order_id)
+        if not ObjectId.is_valid(order_id):
+            results[order_id] = {"order_id": order_id, "result": "invalid_id"}
+        elif order is None:
+            results[order_id] = {"order_id": order_id, "result": "not_found"}
+        elif order["status"] == new_status:
+            results[order_id] = {"order_id": order_id, "result": "unchanged", "status": new_status}
+        elif not can_transition(order["status"], new_status):
+            results[order_id] = {
+                "order_id": order_id,
+                "result": "invalid_transition",
+                "status": order["status"],
+                "allowed": sorted(ORDER_TRANSITIONS.get(order["status"], ()))
+            }
+        else:
+            ops.append(UpdateOne(
+                {"_id": order["_id"], "status": order["status"]},
+                {"$set": {"status": new_status, "updated_at": now, "transition_id": transition_id}}
+            ))
+            pending.append(order)
+
+    changed = []
+    if ops:
+        result = await database.orders.bulk_write(ops, ordered=False)
+        applied = {str(order["_id"]) for order in pending}
+        if result.modified_count < len(ops):
+            current = await database.orders.find(
+                {"_id": {"$in": [order["_id"] for order in pending]}}, {"transition_id": 1}
+            ).to_list(None)
+            applied = {str(order["_id"]) for order in current if order.get("transition_id") == transition_id}
+        for order in pending:
+            order_id = str(order["_id"])
+            if order_id in applied:
+                results[order_id] = {"order_id": order_id, "result": "updated", "previous_status": order["status"], "status": new_status}
+                changed.append(({**order, "status": new_status, "updated_at": now}, order["status"]))
+            else:
+                results[order_id] = {"order_id": order_id, "result": "conflict"}
+
+    return [results[order_id] for order_id in order_ids], changed
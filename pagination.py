@@ -0,0 +1,69 @@
+from fastapi import HTTPException, status
+from bson import ObjectId
+from bson.errors import InvalidId
+from datetime import datetime
+import base64
+import json
+
+def encode_cursor(data: dict) -> str:
+    raw = json.dumps(data, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> dict:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(data, dict):
+            raise ValueError("cursor must decode to an object")
+        return data
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+# Products are paged on _id ascending
+def id_cursor(doc) -> str:
+    return encode_cursor({"id": str(doc["_id"])})
+
+def id_cursor_query(cursor: str) -> dict:
+    data = decode_cursor(cursor)
+    try:
+        return {"_id": {"$gt": ObjectId(data["id"])}}
+    except (KeyError, TypeError, InvalidId):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+# Orders are paged newest first on (created_at, _id)
+def created_at_cursor(doc) -> str:
+    return encode_cursor({"created_at": doc["created_at"].isoformat(), "id": str(doc["_id"])})
+
+def created_at_cursor_query(cursor: str) -> dict:
+    data = decode_cursor(cursor)
+    try:
+        created_at = datetime.fromisoformat(data["created_at"])
+        last_id = ObjectId(data["id"])
+    except (KeyError, TypeError, ValueError, InvalidId):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+    return {
+        "$or": [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "_id": {"$lt": last_id}}
+        ]
+    }
+
+CREATED_AT_SORT = [("created_at", -1), ("_id", -1)]
+
+async def fetch_page(collection, query: dict, sort: list, limit: int, cursor_fn, projection: dict = None):
+    """Fetch one page plus a single lookahead document to decide next_cursor."""
+    docs = await collection.find(query, projection).sort(sort).limit(limit + 1).to_list(limit + 1)
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = cursor_fn(docs[-1])
+    return docs, next_cursor
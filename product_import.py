@@ -0,0 +1,142 @@
+"""
+Bulk product import from JSON or CSV
+Run `python product_import.py products.csv` (or .json) to upsert a catalog file
+"""
+import config
+import asyncio
+import csv
+import io
+import json
+import sys
+from pydantic import ValidationError
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from models import Product
+
+IMPORT_BATCH_SIZE = 500
+
+# CSV cells holding lists are separated with "|"
+CSV_LIST_FIELDS = {"images", "fragrance_notes"}
+
+def product_key(product: dict) -> dict:
+    """Stable identifier used to match existing products: sku, else name."""
+    if product.get("sku"):
+        return {"sku": product["sku"]}
+    return {"name": product["name"]}
+
+# Keeps in_stock in agreement with stock whenever the product tracks stock
+_SYNC_IN_STOCK = {"$set": {"in_stock": {"$cond": [{"$isNumber": "$stock"}, {"$gt": ["$stock", 0]}, "$in_stock"]}}}
+
+def new_product_document(product: Product) -> dict:
+    document = product.dict()
+    if document["stock"] is not None:
+        document["in_stock"] = document["stock"] > 0
+    return document
+
+def product_write_pipeline(product: Product) -> list:
+    """
+    Update pipeline that writes only the fields the client sent. Omitted fields
+    keep their stored value (e.g. an edit without stock leaves tracking on) and
+    fall back to the model default when an upsert creates the product.
+    """
+    given = product.dict(exclude_unset=True)
+    fields = {
+        # $literal so text such as "$5 off" is never read as a field path
+        name: {"$literal": value} if name in given else {"$ifNull": [f"${name}", {"$literal": value}]}
+        for name, value in product.dict().items()
+    }
+    return [{"$set": fields}, _SYNC_IN_STOCK]
+
+def parse_json(data: bytes) -> list:
+    rows = json.loads(data)
+    if isinstance(rows, dict):
+        rows = rows.get("products", [])
+    if not isinstance(rows, list):
+        raise ValueError("Expected a JSON array of products")
+    return rows
+
+def parse_csv(data: bytes) -> list:
+    rows = []
+    for row in csv.DictReader(io.StringIO(data.decode("utf-8-sig"))):
+        product = {}
+        for field, value in row.items():
+            if field is None or value is None or value.strip() == "":
+                continue
+            value = value.strip()
+            if field in CSV_LIST_FIELDS:
+                product[field] = [part.strip() for part in value.split("|") if part.strip()]
+            else:
+                product[field] = value
+        rows.append(product)
+    return rows
+
+def parse_products(data: bytes, fmt: str) -> list:
+    if fmt == "csv":
+        return parse_csv(data)
+    return parse_json(data)
+
+def _error_message(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in e['loc'])}: {e['msg']}" for e in error.errors()
+    )
+
+async def import_products(database, rows: list) -> dict:
+    """Validate and upsert rows in batches; returns counts plus per-row errors."""
+    summary = {"received": len(rows), "upserted": 0, "modified": 0, "matched": 0, "errors": []}
+
+    for start in range(0, len(rows), IMPORT_BATCH_SIZE):
+        batch = rows[start:start + IMPORT_BATCH_SIZE]
+        ops = []
+        op_rows = []
+        for offset, row in enumerate(batch):
+            row_number = start + offset
+            if not isinstance(row, dict):
+                summary["errors"].append({"row": row_number, "error": "Row must be an object"})
+                continue
+            try:
+                product = Product(**row)
+            except ValidationError as e:
+                summary["errors"].append({"row": row_number, "error": _error_message(e)})
+                continue
+            ops.append(UpdateOne(product_key(product.dict()), product_write_pipeline(product), upsert=True))
+            op_rows.append(row_number)
+
+        if not ops:
+            continue
+
+        try:
+            result = await database.products.bulk_write(ops, ordered=False)
+            details = result.bulk_api_result
+        except BulkWriteError as e:
+            details = e.details
+            for write_error in details.get("writeErrors", []):
+                summary["errors"].append({"row": op_rows[write_error["index"]], "error": write_error["errmsg"]})
+
+        summary["upserted"] += details.get("nUpserted", 0)
+        summary["modified"] += details.get("nModified", 0)
+        summary["matched"] += details.get("nMatched", 0)
+
+    summary["errors"].sort(key=lambda e: e["row"])
+    return summary
+
+async def main(path: str):
+    from database import db
+
+    fmt = "csv" if path.lower().endswith(".csv") else "json"
+    with open(path, "rb") as f:
+        rows = parse_products(f.read(), fmt)
+
+    await db.connect_db()
+    summary = await import_products(db.get_db(), rows)
+    await db.close_db()
+
+    print(f"✅ {summary['upserted']} created, {summary['modified']} updated, {len(summary['errors'])} errors")
+    for error in summary["errors"]:
+        print(f"❌ row {error['row']}: {error['error']}")
+    if summary["errors"]:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        raise SystemExit("Usage: python product_import.py <products.json|products.csv>")
+    asyncio.run(main(sys.argv[1]))
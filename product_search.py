@@ -0,0 +1,88 @@
+from typing import Optional
+
+PRICE_BUCKETS = [0, 500, 1000, 1500, 2000, 3000]
+PRICE_BUCKET_OVERFLOW = "3000+"
+
+SEARCH_SORTS = {
+    "relevance": {"score": {"$meta": "textScore"}, "_id": 1},
+    "rating": {"rating": -1, "_id": 1},
+    "price_asc": {"price": 1, "_id": 1},
+    "price_desc": {"price": -1, "_id": 1},
+}
+
+def search_match(
+    q: Optional[str] = None,
+    category: Optional[str] = None,
+    wax_type: Optional[str] = None,
+    min_price: Optional[int] = None,
+    max_price: Optional[int] = None,
+    in_stock: Optional[bool] = None
+) -> dict:
+    match = {}
+    if q:
+        match["$text"] = {"$search": q}
+    if category and category != "all":
+        match["category"] = category
+    if wax_type:
+        match["wax_type"] = wax_type
+    if min_price is not None or max_price is not None:
+        match["price"] = {}
+        if min_price is not None:
+            match["price"]["$gte"] = min_price
+        if max_price is not None:
+            match["price"]["$lte"] = max_price
+    if in_stock is not None:
+        # Products created before in_stock existed count as in stock
+        match["in_stock"] = {"$ne": False} if in_stock else False
+    return match
+
+def _count_by(field: str) -> list:
+    return [
+        {"$group": {"_id": field, "count": {"$sum": 1}}},
+        {"$sort": {"count": -1, "_id": 1}},
+        {"$project": {"_id": 0, "value": "$_id", "count": 1}},
+    ]
+
+def search_pipeline(match: dict, sort: str, skip: int, limit: int, projection: Optional[dict] = None) -> list:
+    """One round trip: the requested page plus facet counts over the whole match."""
+    if sort == "relevance" and "$text" not in match:
+        sort = "rating"
+
+    results = [{"$sort": SEARCH_SORTS[sort]}, {"$skip": skip}, {"$limit": limit}]
+    if projection:
+        results.append({"$project": projection})
+
+    return [
+        {"$match": match},
+        {"$facet": {
+            "results": results,
+            "total": [{"$count": "count"}],
+            "category": _count_by("$category"),
+            "wax_type": _count_by("$wax_type"),
+            "in_stock": _count_by({"$ne": ["$in_stock", False]}),
+            "price": [
+                {"$bucket": {
+                    "groupBy": "$price",
+                    "boundaries": PRICE_BUCKETS,
+                    "default": PRICE_BUCKET_OVERFLOW,
+                    "output": {"count": {"$sum": 1}},
+                }},
+                {"$project": {"_id": 0, "min": "$_id", "count": 1}},
+            ],
+        }},
+    ]
+
+async def run_search(collection, match: dict, sort: str, skip: int, limit: int, projection: Optional[dict] = None) -> dict:
+    facets = await collection.aggregate(search_pipeline(match, sort, skip, limit, projection)).to_list(1)
+    facets = facets[0] if facets else {}
+    total = facets.get("total") or [{"count": 0}]
+    return {
+        "results": facets.get("results", []),
+        "total": total[0]["count"],
+        "facets": {
+            "category": facets.get("category", []),
+            "wax_type": facets.get("wax_type", []),
+            "in_stock": facets.get("in_stock", []),
+            "price": facets.get("price", []),
+        },
+    }
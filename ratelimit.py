@@ -0,0 +1,169 @@
+"""
+Token-bucket rate limits for the password endpoints, checked before any bcrypt work.
+Buckets live in this worker's memory; with RATE_LIMIT_BACKEND=mongo they are also
+shared across workers through the rate_limits collection.
+"""
+from collections import OrderedDict
+from fastapi import HTTPException, Request, status
+from pymongo import ReturnDocument
+from database import db
+from metrics import CallbackMetric, Counter
+import hashlib
+import math
+import os
+import time
+
+RATE_LIMITS_COLLECTION = "rate_limits"
+RATE_LIMIT_ENABLED = os.environ.get("RATE_LIMIT_ENABLED", "1") != "0"
+RATE_LIMIT_BACKEND = os.environ.get("RATE_LIMIT_BACKEND", "memory")
+RATE_LIMIT_MAX_KEYS = int(os.environ.get("RATE_LIMIT_MAX_KEYS", "100000"))
+# Proxies in front of the app that append to X-Forwarded-For (Heroku's router is one);
+# 0 keys buckets on the connecting address
+RATE_LIMIT_PROXY_HOPS = int(os.environ.get("RATE_LIMIT_PROXY_HOPS", "1"))
+
+rate_limit_decisions = Counter("rate_limit_decisions_total", "Rate limiter decisions by limit", ("limit", "outcome"))
+
+def _parse_limit(value: str):
+    # "<requests>/<seconds>", e.g. "20/60" is a burst of 20 refilled over a minute
+    capacity, seconds = value.split("/")
+    return int(capacity), float(seconds)
+
+class RateLimit:
+    def __init__(self, name: str, spec: str):
+        self.name = name
+        self.capacity, self.period_seconds = _parse_limit(spec)
+        self.refill_per_second = self.capacity / self.period_seconds
+
+    def retry_after(self, tokens: float) -> int:
+        return max(1, math.ceil((1 - tokens) / self.refill_per_second))
+
+LOGIN_IP_LIMIT = RateLimit("login_ip", os.environ.get("RATE_LIMIT_LOGIN_IP", "20/60"))
+LOGIN_EMAIL_LIMIT = RateLimit("login_email", os.environ.get("RATE_LIMIT_LOGIN_EMAIL", "5/300"))
+REGISTER_IP_LIMIT = RateLimit("register_ip", os.environ.get("RATE_LIMIT_REGISTER_IP", "10/3600"))
+REGISTER_EMAIL_LIMIT = RateLimit("register_email", os.environ.get("RATE_LIMIT_REGISTER_EMAIL", "3/3600"))
+
+class TokenBuckets:
+    """
+    Every bucket is one (tokens, updated_at) tuple keyed by "<limit>:<client>".
+    Least recently used keys are dropped past max_keys; a dropped bucket simply
+    starts full again, which is also its state once idle for a full period.
+    """
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def take(self, limit: RateLimit, key: str):
+        """Spend one token; returns (allowed, tokens left)."""
+        now = time.monotonic()
+        bucket_key = f"{limit.name}:{key}"
+        tokens, updated_at = self._buckets.pop(bucket_key, (limit.capacity, now))
+        tokens = min(limit.capacity, tokens + (now - updated_at) * limit.refill_per_second)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        self._buckets[bucket_key] = (tokens, now)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return allowed, tokens
+
+    def __len__(self):
+        return len(self._buckets)
+
+def _mongo_take_pipeline(limit: RateLimit) -> list:
+    # $$NOW is the server clock, so workers with skewed clocks share one timeline
+    elapsed_seconds = {"$divide": [{"$subtract": ["$$NOW", {"$ifNull": ["$updated_at", "$$NOW"]}]}, 1000]}
+    return [
+        {"$set": {
+            "tokens": {"$min": [
+                limit.capacity,
+                {"$add": [{"$ifNull": ["$tokens", limit.capacity]}, {"$multiply": [elapsed_seconds, limit.refill_per_second]}]}
+            ]},
+            "updated_at": "$$NOW",
+            "expires_at": {"$add": ["$$NOW", int(limit.period_seconds * 1000)]},
+        }},
+        {"$set": {
+            "allowed": {"$gte": ["$tokens", 1]},
+            "tokens": {"$cond": [{"$gte": ["$tokens", 1]}, {"$subtract": ["$tokens", 1]}, "$tokens"]},
+        }},
+    ]
+
+class RateLimiter:
+    def __init__(self, backend: str = RATE_LIMIT_BACKEND):
+        self.backend = backend
+        self.local = TokenBuckets()
+
+    async def _take_shared(self, limit: RateLimit, key: str):
+        bucket = await db.get_db()[RATE_LIMITS_COLLECTION].find_one_and_update(
+            {"_id": f"{limit.name}:{key}"},
+            _mongo_take_pipeline(limit),
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return bucket["allowed"], bucket["tokens"]
+
+    async def take(self, limit: RateLimit, key: str):
+        allowed, tokens = self.local.take(limit, key)
+        # The shared bucket has seen at least this worker's requests, so a
+        # local rejection stands without a round trip
+        if allowed and self.backend == "mongo":
+            try:
+                allowed, tokens = await self._take_shared(limit, key)
+            except Exception as e:
+                # Fall back to the local decision rather than failing logins
+                print(f"⚠️  Shared rate limit check failed: {e}")
+                rate_limit_decisions.inc((limit.name, "error"))
+        return allowed, tokens
+
+    async def check(self, limit: RateLimit, key: str):
+        allowed, tokens = await self.take(limit, key)
+        rate_limit_decisions.inc((limit.name, "allowed" if allowed else "rejected"))
+        if not allowed:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many attempts, please retry later",
+                headers={"Retry-After": str(limit.retry_after(tokens))},
+            )
+
+rate_limiter = RateLimiter()
+
+CallbackMetric("rate_limit_buckets", "Token buckets held in this worker", "gauge", lambda: len(rate_limiter.local))
+
+def client_ip(request: Request) -> str:
+    # Not request.client: uvicorn's proxy_headers reports the leftmost X-Forwarded-For
+    # entry, which the client sets itself. Each trusted proxy appends the address it
+    # saw, so the entry RATE_LIMIT_PROXY_HOPS from the right is the real client
+    if RATE_LIMIT_PROXY_HOPS > 0:
+        forwarded = [
+            host.strip()
+            for header in request.headers.getlist("x-forwarded-for")
+            for host in header.split(",") if host.strip()
+        ]
+        if forwarded:
+            return forwarded[-min(RATE_LIMIT_PROXY_HOPS, len(forwarded))]
+    return request.client.host if request.client else "unknown"
+
+async def _email_key(request: Request):
+    try:
+        body = await request.json()
+    except ValueError:
+        return None
+    email = body.get("email") if isinstance(body, dict) else None
+    if not isinstance(email, str) or not email.strip():
+        return None
+    # Hashed so the bucket table holds no addresses
+    return hashlib.sha256(email.strip().lower().encode()).hexdigest()[:32]
+
+async def _limit(request: Request, ip_limit: RateLimit, email_limit: RateLimit):
+    if not RATE_LIMIT_ENABLED:
+        return
+    await rate_limiter.check(ip_limit, client_ip(request))
+    email = await _email_key(request)
+    if email is not None:
+        await rate_limiter.check(email_limit, email)
+
+async def limit_login(request: Request):
+    await _limit(request, LOGIN_IP_LIMIT, LOGIN_EMAIL_LIMIT)
+
+async def limit_register(request: Request):
+    await _limit(request, REGISTER_IP_LIMIT, REGISTER_EMAIL_LIMIT)
@@ -0,0 +1,163 @@
+"""
+Access-token revocation: a Bloom filter of revoked token ids plus per-user
+cutoffs, kept in memory and synced from the revoked_tokens collection
+"""
+from cache import TTLCache
+from datetime import datetime, timedelta, timezone
+import asyncio
+import hashlib
+import os
+import time
+
+REVOKED_TOKENS_COLLECTION = "revoked_tokens"
+REVOCATION_SYNC_SECONDS = float(os.environ.get("REVOCATION_SYNC_SECONDS", "30"))
+# A full rebuild drops ids whose tokens have expired (the TTL index removed them)
+REVOCATION_REBUILD_SECONDS = float(os.environ.get("REVOCATION_REBUILD_SECONDS", "3600"))
+REVOCATION_BLOOM_BITS = int(os.environ.get("REVOCATION_BLOOM_BITS", str(1 << 20)))
+REVOCATION_BLOOM_HASHES = 7
+
+class BloomFilter:
+    def __init__(self, bits: int = REVOCATION_BLOOM_BITS, hashes: int = REVOCATION_BLOOM_HASHES):
+        self.bits = bits
+        self.hashes = hashes
+        self._array = bytearray((bits + 7) // 8)
+
+    def _positions(self, value: str):
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.bits for i in range(self.hashes)]
+
+    def add(self, value: str):
+        for position in self._positions(value):
+            self._array[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, value: str) -> bool:
+        return all(self._array[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+def _timestamp(value: datetime) -> float:
+    return value.replace(tzinfo=timezone.utc).timestamp()
+
+class RevocationList:
+    """
+    Answers "is this token revoked?" from memory. Tokens are revoked one at a
+    time by jti (logout) or all at once per user by issue time (role changes).
+    A Bloom filter hit is confirmed against Mongo, so false positives cost one
+    lookup and never reject a valid token.
+    """
+
+    def __init__(self):
+        self._bloom = BloomFilter()
+        self._user_cutoffs = {}
+        self._confirmed = TTLCache(max_entries=10000, ttl_seconds=REVOCATION_SYNC_SECONDS)
+        self._synced_through = datetime.min
+        self._last_sync = 0.0
+        self._last_rebuild = 0.0
+        self._sync_task = None
+        self._rebuilding = None
+
+    @staticmethod
+    def _add(bloom: BloomFilter, user_cutoffs: dict, record):
+        if record["kind"] == "user":
+            cutoff = _timestamp(record["revoked_at"])
+            user_cutoffs[record["user_id"]] = max(cutoff, user_cutoffs.get(record["user_id"], 0))
+        else:
+            bloom.add(record["jti"])
+
+    def _apply(self, record):
+        self._add(self._bloom, self._user_cutoffs, record)
+        if self._rebuilding is not None:
+            # Revocations made while a rebuild scans must survive the swap
+            self._add(*self._rebuilding, record)
+
+    async def sync(self, database, rebuild: bool = False):
+        collection = database[REVOKED_TOKENS_COLLECTION]
+        projection = {"kind": 1, "jti": 1, "user_id": 1, "revoked_at": 1}
+        if rebuild:
+            # Built off to the side and swapped in whole, so requests keep
+            # checking against the current filter while the scan runs
+            bloom, user_cutoffs = BloomFilter(), {}
+            synced_through = datetime.min
+            self._rebuilding = (bloom, user_cutoffs)
+            try:
+                async for record in collection.find({}, projection):
+                    self._add(bloom, user_cutoffs, record)
+                    synced_through = max(synced_through, record["revoked_at"])
+            finally:
+                self._rebuilding = None
+            self._bloom, self._user_cutoffs = bloom, user_cutoffs
+            self._synced_through = max(self._synced_through, synced_through)
+            self._last_rebuild = time.monotonic()
+        else:
+            # Only records read here move the watermark, never this worker's own
+            # revocations: another worker may have written an earlier revoked_at.
+            # Each query also reaches back one sync interval to cover commits that
+            # land out of order and clock skew between workers
+            query = {}
+            if self._synced_through > datetime.min:
+                query = {"revoked_at": {"$gte": self._synced_through - timedelta(seconds=REVOCATION_SYNC_SECONDS)}}
+            synced_through = self._synced_through
+            async for record in collection.find(query, projection):
+                self._apply(record)
+                synced_through = max(synced_through, record["revoked_at"])
+            self._synced_through = synced_through
+        self._last_sync = time.monotonic()
+
+    def maybe_sync(self, database):
+        """Refresh in the background once the last sync is stale; never blocks a request."""
+        now = time.monotonic()
+        if now - self._last_sync < REVOCATION_SYNC_SECONDS:
+            return
+        if self._sync_task is not None and not self._sync_task.done():
+            return
+        self._last_sync = now
+        rebuild = now - self._last_rebuild >= REVOCATION_REBUILD_SECONDS
+        self._sync_task = asyncio.create_task(self._safe_sync(database, rebuild))
+
+    async def _safe_sync(self, database, rebuild: bool):
+        try:
+            await self.sync(database, rebuild)
+        except Exception as e:
+            print(f"⚠️  Revocation sync failed: {e}")
+
+    async def is_revoked(self, database, claims: dict) -> bool:
+        user_id = claims.get("uid")
+        if user_id in self._user_cutoffs and claims.get("iat", 0) <= self._user_cutoffs[user_id]:
+            return True
+
+        jti = claims.get("jti")
+        if jti is None or jti not in self._bloom:
+            return False
+
+        confirmed = self._confirmed.get(jti)
+        if confirmed is None:
+            record = await database[REVOKED_TOKENS_COLLECTION].find_one({"_id": f"jti:{jti}"}, {"_id": 1})
+            confirmed = record is not None
+            self._confirmed.set(jti, confirmed)
+        return confirmed
+
+    async def revoke_token(self, database, jti: str, expires_at: datetime):
+        record = {
+            "_id": f"jti:{jti}",
+            "kind": "token",
+            "jti": jti,
+            "revoked_at": datetime.utcnow(),
+            "expires_at": expires_at
+        }
+        await database[REVOKED_TOKENS_COLLECTION].replace_one({"_id": record["_id"]}, record, upsert=True)
+        self._apply(record)
+        self._confirmed.set(jti, True)
+
+    async def revoke_user(self, database, user_id: str, expires_at: datetime):
+        """Revoke every token issued to user_id up to now."""
+        record = {
+            "_id": f"user:{user_id}",
+            "kind": "user",
+            "user_id": user_id,
+            "revoked_at": datetime.utcnow(),
+            "expires_at": expires_at
+        }
+        await database[REVOKED_TOKENS_COLLECTION].replace_one({"_id": record["_id"]}, record, upsert=True)
+        self._apply(record)
+
+revocation_list = RevocationList()
@@ -0,0 +1,148 @@
+"""
+Daily sales rollups maintained incrementally from the order routes
+Run `python rollups.py` to rebuild every bucket from the orders and their archive
+"""
+import config
+import asyncio
+import os
+from datetime import datetime
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+ROLLUP_COLLECTION = "sales_rollups"
+# Op ids each bucket remembers. Jobs are retried within minutes of their first
+# run, so only the latest ones are needed and a busy day's buckets stay small
+ROLLUP_APPLIED_OPS = int(os.environ.get("ROLLUP_APPLIED_OPS", "1000"))
+
+# Cancelled orders keep their status bucket but stop counting as units sold
+UNSOLD_STATUSES = {"cancelled"}
+
+def day_key(value: datetime) -> str:
+    return value.strftime("%Y-%m-%d")
+
+def _bucket(day: str, dimension: str, key: str, inc: dict, set_fields: dict = None, op_id=None) -> UpdateOne:
+    query = {"_id": f"{day}:{dimension}:{key}"}
+    update = {
+        "$inc": inc,
+        "$setOnInsert": {"day": day, "dimension": dimension, "key": key},
+    }
+    if set_fields:
+        update["$set"] = set_fields
+    if op_id is not None:
+        # A bucket that already holds op_id doesn't match, and the upsert then
+        # fails with a duplicate _id, so a repeated operation never counts twice
+        query["applied"] = {"$ne": op_id}
+        update["$push"] = {"applied": {"$each": [op_id], "$slice": -ROLLUP_APPLIED_OPS}}
+    return UpdateOne(query, update, upsert=True)
+
+def _product_buckets(order, day: str, sign: int, op_id=None) -> list:
+    # One op per product, since a bucket takes each op_id only once
+    totals = {}
+    for item in order["items"]:
+        units, revenue, _ = totals.get(item["product_id"], (0, 0, None))
+        totals[item["product_id"]] = (units + item["quantity"], revenue + item["price"] * item["quantity"], item["name"])
+    return [
+        _bucket(day, "product", product_id, {"units": sign * units, "revenue": sign * revenue}, {"name": name}, op_id)
+        for product_id, (units, revenue, name) in totals.items()
+    ]
+
+async def _apply(database, ops: list):
+    try:
+        await database[ROLLUP_COLLECTION].bulk_write(ops, ordered=False)
+    except BulkWriteError as e:
+        # Duplicate _id means the bucket was already updated by this operation
+        if any(error.get("code") != 11000 for error in e.details.get("writeErrors", [])) or e.details.get("writeConcernErrors"):
+            raise
+
+async def record_order_created(database, order, op_id=None):
+    """Count a new order. With op_id, repeating the call for the same op_id is a no-op."""
+    day = day_key(order["created_at"])
+    ops = [_bucket(day, "status", order["status"], {"orders": 1, "revenue": order["total"]}, op_id=op_id)]
+    if order["status"] not in UNSOLD_STATUSES:
+        ops += _product_buckets(order, day, 1, op_id)
+    await _apply(database, ops)
+
+async def record_status_change(database, order, old_status: str, new_status: str, op_id=None):
+    """Move an order between status buckets. With op_id, repeating the call is a no-op."""
+    if old_status == new_status:
+        return
+
+    day = day_key(order["created_at"])
+    ops = [
+        _bucket(day, "status", old_status, {"orders": -1, "revenue": -order["total"]}, op_id=op_id),
+        _bucket(day, "status", new_status, {"orders": 1, "revenue": order["total"]}, op_id=op_id),
+    ]
+    was_sold = old_status not in UNSOLD_STATUSES
+    is_sold = new_status not in UNSOLD_STATUSES
+    if was_sold != is_sold:
+        ops += _product_buckets(order, day, 1 if is_sold else -1, op_id)
+    await _apply(database, ops)
+
+_DAY = {"$dateToString": {"format": "%Y-%m-%d", "date": "$created_at"}}
+
+# Rebuilds count archived orders too; they were rolled up before they moved
+_ALL_ORDERS = {"$unionWith": "orders_archive"}
+
+# Recomputed totals replace a bucket's but keep its applied op ids
+_KEEP_APPLIED = [{"$replaceWith": {"$mergeObjects": ["$$new", {"applied": "$applied"}]}}]
+
+STATUS_ROLLUP_PIPELINE = [
+    _ALL_ORDERS,
+    {"$group": {
+        "_id": {"day": _DAY, "key": "$status"},
+        "orders": {"$sum": 1},
+        "revenue": {"$sum": "$total"},
+    }},
+    {"$project": {
+        "_id": {"$concat": ["$_id.day", ":status:", "$_id.key"]},
+        "day": "$_id.day",
+        "dimension": "status",
+        "key": "$_id.key",
+        "orders": 1,
+        "revenue": 1,
+    }},
+    {"$merge": {"into": ROLLUP_COLLECTION, "whenMatched": _KEEP_APPLIED}},
+]
+
+PRODUCT_ROLLUP_PIPELINE = [
+    _ALL_ORDERS,
+    {"$match": {"status": {"$nin": list(UNSOLD_STATUSES)}}},
+    {"$unwind": "$items"},
+    {"$group": {
+        "_id": {"day": _DAY, "key": "$items.product_id"},
+        "name": {"$last": "$items.name"},
+        "units": {"$sum": "$items.quantity"},
+        "revenue": {"$sum": {"$multiply": ["$items.price", "$items.quantity"]}},
+    }},
+    {"$project": {
+        "_id": {"$concat": ["$_id.day", ":product:", "$_id.key"]},
+        "day": "$_id.day",
+        "dimension": "product",
+        "key": "$_id.key",
+        "name": 1,
+        "units": 1,
+        "revenue": 1,
+    }},
+    {"$merge": {"into": ROLLUP_COLLECTION, "whenMatched": _KEEP_APPLIED}},
+]
+
+async def rebuild_rollups(database):
+    """Recompute every rollup bucket from the orders and orders_archive collections."""
+    # Totals restart from zero but buckets are kept, so a job retried after the
+    # rebuild still finds its op id and doesn't count the order a second time
+    await database[ROLLUP_COLLECTION].update_many({"dimension": "status"}, {"$set": {"orders": 0, "revenue": 0}})
+    await database[ROLLUP_COLLECTION].update_many({"dimension": "product"}, {"$set": {"units": 0, "revenue": 0}})
+    await database.orders.aggregate(STATUS_ROLLUP_PIPELINE).to_list(None)
+    await database.orders.aggregate(PRODUCT_ROLLUP_PIPELINE).to_list(None)
+    return await database[ROLLUP_COLLECTION].count_documents({})
+
+async def main():
+    from database import db
+
+    await db.connect_db()
+    buckets = await rebuild_rollups(db.get_db())
+    print(f"✅ Rebuilt {buckets} rollup buckets")
+    await db.close_db()
+
+if __name__ == "__main__":
+    asyncio.run(main())
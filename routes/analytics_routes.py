@@ -0,0 +1,56 @@
+from fastapi import APIRouter, Depends, Query
+from typing import Optional
+from models import TokenData
+from auth import get_current_admin
+from database import db
+from rollups import ROLLUP_COLLECTION, UNSOLD_STATUSES
+from datetime import date, timedelta
+
+router = APIRouter(prefix="/api/analytics", tags=["Analytics"])
+
+@router.get("/sales")
+async def get_sales_analytics(
+    current_user: TokenData = Depends(get_current_admin),
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    top: int = Query(10, ge=1, le=100)
+):
+    database = db.get_db()
+
+    end_date = end_date or date.today()
+    start_date = start_date or end_date - timedelta(days=29)
+    query = {"day": {"$gte": start_date.isoformat(), "$lte": end_date.isoformat()}}
+
+    buckets = await database[ROLLUP_COLLECTION].find(query, {"applied": 0}).to_list(None)
+
+    days = {}
+    by_status = {}
+    products = {}
+    for bucket in buckets:
+        if bucket["dimension"] == "status":
+            status_totals = by_status.setdefault(bucket["key"], {"orders": 0, "revenue": 0})
+            status_totals["orders"] += bucket.get("orders", 0)
+            status_totals["revenue"] += bucket.get("revenue", 0)
+
+            day_totals = days.setdefault(bucket["day"], {"day": bucket["day"], "orders": 0, "revenue": 0})
+            day_totals["orders"] += bucket.get("orders", 0)
+            if bucket["key"] not in UNSOLD_STATUSES:
+                day_totals["revenue"] += bucket.get("revenue", 0)
+        elif bucket["dimension"] == "product":
+            product_totals = products.setdefault(
+                bucket["key"], {"product_id": bucket["key"], "name": bucket.get("name"), "units": 0, "revenue": 0}
+            )
+            product_totals["units"] += bucket.get("units", 0)
+            product_totals["revenue"] += bucket.get("revenue", 0)
+
+    top_products = sorted(products.values(), key=lambda p: p["units"], reverse=True)[:top]
+
+    return {
+        "start_date": start_date,
+        "end_date": end_date,
+        "total_orders": sum(s["orders"] for s in by_status.values()),
+        "total_revenue": sum(s["revenue"] for k, s in by_status.items() if k not in UNSOLD_STATUSES),
+        "by_status": by_status,
+        "days": [days[day] for day in sorted(days)],
+        "top_products": top_products
+    }
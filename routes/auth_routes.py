@@ -1,13 +1,17 @@
 from fastapi import APIRouter, HTTPException, status, Depends
-from models import UserRegister, UserLogin, Token, UserResponse, UserUpdate
-from auth import get_password_hash, verify_password, create_access_token, get_current_user
+from models import UserRegister, UserLogin, Token, UserResponse, UserUpdate, UserRoleUpdate, TokenData
+from auth import get_password_hash_async, verify_password_async, create_access_token, get_current_user, get_current_admin, password_pool, ACCESS_TOKEN_EXPIRE_MINUTES
+from revocation import revocation_list
+from ratelimit import limit_login, limit_register
 from database import db
-from datetime import datetime
+from datetime import datetime, timedelta
 from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
 
 router = APIRouter(prefix="/api/auth", tags=["Authentication"])
 
-@router.post("/register", response_model=Token)
+# Rate limits run before the body is handled, so rejected attempts never reach bcrypt
+@router.post("/register", response_model=Token, dependencies=[Depends(limit_register)])
 async def register_user(user: UserRegister):
     database = db.get_db()
     
@@ -23,29 +27,36 @@ async def register_user(user: UserRegister):
     user_dict = {
         "name": user.name,
         "email": user.email,
-        "password": get_password_hash(user.password),
+        "password": await get_password_hash_async(user.password),
         "phone": user.phone,
         "is_admin": False,
         "created_at": datetime.utcnow(),
         "updated_at": datetime.utcnow()
     }
     
-    result = await database.users.insert_one(user_dict)
+    try:
+        result = await database.users.insert_one(user_dict)
+    except DuplicateKeyError:
+        # A concurrent registration for the same email won the email_unique index
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Email already registered"
+        )
     
     # Create access token
     access_token = create_access_token(
-        data={"sub": user.email, "is_admin": False}
+        data={"sub": user.email, "uid": str(result.inserted_id), "is_admin": False}
     )
     
     return {"access_token": access_token, "token_type": "bearer"}
 
-@router.post("/login", response_model=Token)
+@router.post("/login", response_model=Token, dependencies=[Depends(limit_login)])
 async def login_user(user: UserLogin):
     database = db.get_db()
     
     # Find user
     db_user = await database.users.find_one({"email": user.email})
-    if not db_user or not verify_password(user.password, db_user["password"]):
+    if not db_user or not await verify_password_async(user.password, db_user["password"]):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -54,16 +65,70 @@ async def login_user(user: UserLogin):
     
     # Create access token
     access_token = create_access_token(
-        data={"sub": user.email, "is_admin": db_user.get("is_admin", False)}
+        data={"sub": user.email, "uid": str(db_user["_id"]), "is_admin": db_user.get("is_admin", False)}
     )
     
     return {"access_token": access_token, "token_type": "bearer"}
 
+@router.post("/logout")
+async def logout_user(current_user: TokenData = Depends(get_current_user)):
+    database = db.get_db()
+    
+    if current_user.jti and current_user.exp:
+        await revocation_list.revoke_token(database, current_user.jti, datetime.utcfromtimestamp(current_user.exp))
+    else:
+        # Tokens issued without an id can only be revoked together
+        await revocation_list.revoke_user(
+            database, current_user.user_id, datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+        )
+    
+    return {"message": "Logged out successfully"}
+
+@router.put("/users/{user_id}/role", response_model=UserResponse)
+async def update_user_role(user_id: str, role_update: UserRoleUpdate, current_user: TokenData = Depends(get_current_admin)):
+    database = db.get_db()
+    
+    if not ObjectId.is_valid(user_id):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid user ID"
+        )
+    
+    result = await database.users.find_one_and_update(
+        {"_id": ObjectId(user_id)},
+        {"$set": {"is_admin": role_update.is_admin, "updated_at": datetime.utcnow()}},
+        return_document=True
+    )
+    
+    if not result:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+    
+    # Existing tokens still carry the old is_admin claim, so they stop working
+    await revocation_list.revoke_user(
+        database, user_id, datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    )
+    
+    return {
+        "id": str(result["_id"]),
+        "name": result["name"],
+        "email": result["email"],
+        "phone": result.get("phone"),
+        "is_admin": result.get("is_admin", False),
+        "created_at": result["created_at"]
+    }
+
+@router.get("/password-pool/stats")
+async def get_password_pool_stats(current_user: TokenData = Depends(get_current_admin)):
+    return password_pool.stats()
+
 @router.get("/me", response_model=UserResponse)
-async def get_current_user_info(current_user: dict = Depends(get_current_user)):
+async def get_current_user_info(current_user: TokenData = Depends(get_current_user)):
     database = db.get_db()
     
-    db_user = await database.users.find_one({"email": current_user["email"]})
+    db_user = await database.users.find_one({"email": current_user.email})
     if not db_user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -80,14 +145,14 @@ async def get_current_user_info(current_user: dict = Depends(get_current_user)):
     }
 
 @router.put("/me", response_model=UserResponse)
-async def update_user_profile(user_update: UserUpdate, current_user: dict = Depends(get_current_user)):
+async def update_user_profile(user_update: UserUpdate, current_user: TokenData = Depends(get_current_user)):
     database = db.get_db()
     
     update_data = {k: v for k, v in user_update.dict().items() if v is not None}
     update_data["updated_at"] = datetime.utcnow()
     
     result = await database.users.find_one_and_update(
-        {"email": current_user["email"]},
+        {"email": current_user.email},
         {"$set": update_data},
         return_document=True
     )
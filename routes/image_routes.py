@@ -0,0 +1,55 @@
+from fastapi import APIRouter, HTTPException, status, Depends, Path, Request
+from fastapi.responses import Response
+from models import TokenData
+from auth import get_current_admin
+from database import db
+from images import (
+    DERIVATIVE_FORMATS, IMMUTABLE_CACHE_CONTROL, ORIGINAL_MEDIA_TYPES,
+    derivative_cache, get_derivative, read_original, store_original
+)
+
+router = APIRouter(prefix="/api/images", tags=["Images"])
+
+# Image ids are content hashes, so a URL never changes meaning
+IMAGE_ID_PATTERN = "^[0-9a-f]{32}$"
+
+def image_response(data: bytes, media_type: str) -> Response:
+    return Response(content=data, media_type=media_type, headers={"Cache-Control": IMMUTABLE_CACHE_CONTROL})
+
+@router.post("/", status_code=status.HTTP_201_CREATED)
+async def upload_image(request: Request, current_user: TokenData = Depends(get_current_admin)):
+    return await store_original(db.get_db(), await request.body())
+
+@router.get("/cache/stats")
+async def get_image_cache_stats(current_user: TokenData = Depends(get_current_admin)):
+    return derivative_cache.stats()
+
+@router.get("/{image_id}/w{width:int}.{extension}")
+async def get_image_derivative(width: int, extension: str, image_id: str = Path(..., pattern=IMAGE_ID_PATTERN)):
+    if extension not in DERIVATIVE_FORMATS or width <= 0:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Image not found"
+        )
+    
+    data = await get_derivative(db.get_db(), image_id, width, extension)
+    if data is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Image not found"
+        )
+    
+    return image_response(data, DERIVATIVE_FORMATS[extension][1])
+
+@router.get("/{image_id}.{extension}")
+async def get_original_image(extension: str, image_id: str = Path(..., pattern=IMAGE_ID_PATTERN)):
+    data = None
+    if extension in ORIGINAL_MEDIA_TYPES:
+        data = await read_original(db.get_db(), image_id, extension)
+    if data is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Image not found"
+        )
+    
+    return image_response(data, ORIGINAL_MEDIA_TYPES[extension])
@@ -1,12 +1,24 @@
-from fastapi import APIRouter, HTTPException, status, Depends
-from typing import List, Optional
-from models import OrderCreate, OrderResponse, OrderStatusUpdate
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Header
+from fastapi.responses import StreamingResponse
+from typing import Optional
+from models import OrderCreate, OrderResponse, OrderPage, OrderStatusUpdate, BulkOrderStatusUpdate, TokenData
 from auth import get_current_user, get_current_admin
 from database import db
+from pagination import created_at_cursor_query
+from archive import ORDERS_ARCHIVE_COLLECTION, fetch_order_page, find_order
+from order_jobs import enqueue_order_created, enqueue_status_change, enqueue_status_changes
+from order_status import BULK_STATUS_MAX_ORDERS, statuses_leading_to, transition_orders
+from serialization import LeanJSONResponse
+from order_numbers import order_number_allocator
+from inventory import reserve_stock, release_stock, release_order_stock, reserved_stock_record
+from routes.product_routes import invalidate_product_cache
+from idempotency import run_idempotent
 from bson import ObjectId
+from pymongo import ReturnDocument
 from datetime import datetime
-import random
-import string
+import csv
+import io
+import json
 
 router = APIRouter(prefix="/api/orders", tags=["Orders"])
 
@@ -25,59 +37,246 @@ def order_helper(order) -> dict:
         "updated_at": order["updated_at"]
     }
 
-def generate_order_number():
-    return f"ORD-{''.join(random.choices(string.digits, k=5))}"
+def orders_query(status_filter: Optional[str] = None, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None) -> dict:
+    query = {}
+    if status_filter and status_filter != "all":
+        query["status"] = status_filter
+    if start_date or end_date:
+        query["created_at"] = {}
+        if start_date:
+            query["created_at"]["$gte"] = start_date
+        if end_date:
+            query["created_at"]["$lte"] = end_date
+    return query
+
+EXPORT_CHUNK_ROWS = 500
+
+EXPORT_CSV_COLUMNS = [
+    "id", "order_number", "user_id", "status", "total", "payment_method", "item_count", "items",
+    "shipping_name", "shipping_phone", "shipping_address", "shipping_city", "shipping_state",
+    "shipping_pincode", "notes", "created_at", "updated_at"
+]
+
+def _export_default(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+def order_csv_row(order) -> list:
+    shipping = order.get("shipping_address") or {}
+    items = order.get("items") or []
+    return [
+        str(order["_id"]),
+        order["order_number"],
+        str(order["user_id"]),
+        order["status"],
+        order["total"],
+        order["payment_method"],
+        sum(item.get("quantity", 0) for item in items),
+        json.dumps(items, default=_export_default),
+        shipping.get("name"),
+        shipping.get("phone"),
+        shipping.get("address"),
+        shipping.get("city"),
+        shipping.get("state"),
+        shipping.get("pincode"),
+        order.get("notes"),
+        order["created_at"].isoformat(),
+        order["updated_at"].isoformat()
+    ]
+
+async def chain_cursors(*cursors):
+    # Exports read the hot tier, then the archive; each part is newest first
+    for cursor in cursors:
+        async for order in cursor:
+            yield order
+
+async def stream_orders_ndjson(cursor):
+    chunk = []
+    async for order in cursor:
+        chunk.append(json.dumps(order_helper(order), default=_export_default))
+        if len(chunk) >= EXPORT_CHUNK_ROWS:
+            yield "\n".join(chunk) + "\n"
+            chunk = []
+    if chunk:
+        yield "\n".join(chunk) + "\n"
+
+async def stream_orders_csv(cursor):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_CSV_COLUMNS)
+    yield buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    
+    rows = 0
+    async for order in cursor:
+        writer.writerow(order_csv_row(order))
+        rows += 1
+        if rows >= EXPORT_CHUNK_ROWS:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            rows = 0
+    if rows:
+        yield buffer.getvalue()
 
 @router.post("/", response_model=OrderResponse)
-async def create_order(order: OrderCreate, current_user: dict = Depends(get_current_user)):
+async def create_order(
+    order: OrderCreate,
+    current_user: TokenData = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255)
+):
     database = db.get_db()
     
-    # Get user details
-    user = await database.users.find_one({"email": current_user["email"]})
-    if not user:
+    if idempotency_key is None:
+        return await place_order(database, order, current_user)
+    
+    # Retries with the same key replay the first response instead of ordering twice
+    return await run_idempotent(
+        database,
+        f"orders:{current_user.user_id}",
+        idempotency_key,
+        order.dict(),
+        lambda: place_order(database, order, current_user)
+    )
+
+async def place_order(database, order: OrderCreate, current_user: TokenData) -> dict:
+    if not order.items:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Order has no items"
         )
+    if not all(ObjectId.is_valid(item.product_id) for item in order.items):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid product ID"
+        )
+    
+    # Load every line item's product in one round trip
+    quantities = {}
+    for item in order.items:
+        product_id = ObjectId(item.product_id)
+        quantities[product_id] = quantities.get(product_id, 0) + item.quantity
     
-    # Calculate total
-    total = sum(item.price * item.quantity for item in order.items)
+    products = await database.products.find(
+        {"_id": {"$in": list(quantities)}},
+        {"name": 1, "price": 1, "in_stock": 1, "stock": 1}
+    ).to_list(len(quantities))
+    products = {product["_id"]: product for product in products}
     
-    # Create order
+    missing = [str(product_id) for product_id in quantities if product_id not in products]
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown products: {', '.join(missing)}"
+        )
+    unavailable = [product["name"] for product in products.values() if not product.get("in_stock", True)]
+    if unavailable:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Out of stock: {', '.join(unavailable)}"
+        )
+    
+    # Price from the catalog, never from the client
+    items = []
+    for item in order.items:
+        product = products[ObjectId(item.product_id)]
+        items.append({**item.dict(), "name": product["name"], "price": product["price"]})
+    total = sum(item["price"] * item["quantity"] for item in items)
+    
+    # Reserve stock for tracked products; all-or-nothing
+    tracked = {
+        product_id: quantity
+        for product_id, quantity in quantities.items()
+        if products[product_id].get("stock") is not None
+    }
+    short, remaining = await reserve_stock(database, tracked)
+    if short:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Insufficient stock: {', '.join(products[product_id]['name'] for product_id in short)}"
+        )
+    # Create order; timestamps at Mongo's millisecond precision so the
+    # response matches what later reads of this order return
+    now = datetime.utcnow()
+    now = now.replace(microsecond=now.microsecond // 1000 * 1000)
     order_dict = {
-        "user_id": user["_id"],
-        "order_number": generate_order_number(),
-        "items": [item.dict() for item in order.items],
+        "user_id": ObjectId(current_user.user_id),
+        "items": items,
         "shipping_address": order.shipping_address.dict(),
         "payment_method": order.payment_method,
         "status": "pending",
         "total": total,
         "notes": order.notes,
-        "created_at": datetime.utcnow(),
-        "updated_at": datetime.utcnow()
+        "reserved_stock": reserved_stock_record(tracked),
+        "created_at": now,
+        "updated_at": now
     }
     
-    result = await database.orders.insert_one(order_dict)
-    created_order = await database.orders.find_one({"_id": result.inserted_id})
+    # Everything awaited after a successful reservation sits in here, so an error
+    # or a dropped request gives the stock back
+    try:
+        if any(stock <= 0 for stock in remaining.values()):
+            # Something sold out (judged after the update, so concurrent orders that
+            # empty a product together are caught); cached listings would show it in stock
+            await invalidate_product_cache(database)
+        order_dict["order_number"] = await order_number_allocator.next(database)
+        await database.orders.insert_one(order_dict)
+    except BaseException:
+        await release_stock(database, tracked)
+        raise
+    await enqueue_order_created(database, order_dict)
     
-    return order_helper(created_order)
+    return order_helper(order_dict)
 
-@router.get("/my-orders", response_model=List[OrderResponse])
-async def get_my_orders(current_user: dict = Depends(get_current_user)):
+@router.get("/my-orders", response_model=OrderPage)
+async def get_my_orders(
+    current_user: TokenData = Depends(get_current_user),
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None
+):
     database = db.get_db()
     
-    user = await database.users.find_one({"email": current_user["email"]})
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
+    query = {"user_id": ObjectId(current_user.user_id)}
+    if cursor:
+        query.update(created_at_cursor_query(cursor))
+    
+    orders, next_cursor = await fetch_order_page(database, query, limit)
+    return LeanJSONResponse({"items": [order_helper(order) for order in orders], "next_cursor": next_cursor})
+
+@router.get("/export")
+async def export_orders(
+    current_user: TokenData = Depends(get_current_admin),
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    status_filter: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None
+):
+    database = db.get_db()
+    
+    query = orders_query(status_filter, start_date, end_date)
+    cursor = chain_cursors(
+        database.orders.find(query).sort("created_at", -1).batch_size(EXPORT_CHUNK_ROWS),
+        database[ORDERS_ARCHIVE_COLLECTION].find(query).sort("created_at", -1).batch_size(EXPORT_CHUNK_ROWS)
+    )
     
-    orders = await database.orders.find({"user_id": user["_id"]}).sort("created_at", -1).to_list(100)
-    return [order_helper(order) for order in orders]
+    if format == "csv":
+        return StreamingResponse(
+            stream_orders_csv(cursor),
+            media_type="text/csv",
+            headers={"Content-Disposition": "attachment; filename=orders.csv"}
+        )
+    return StreamingResponse(
+        stream_orders_ndjson(cursor),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": "attachment; filename=orders.ndjson"}
+    )
 
 @router.get("/{order_id}", response_model=OrderResponse)
-async def get_order(order_id: str, current_user: dict = Depends(get_current_user)):
+async def get_order(order_id: str, current_user: TokenData = Depends(get_current_user)):
     database = db.get_db()
     
     if not ObjectId.is_valid(order_id):
@@ -86,7 +285,7 @@ async def get_order(order_id: str, current_user: dict = Depends(get_current_user
             detail="Invalid order ID"
         )
     
-    order = await database.orders.find_one({"_id": ObjectId(order_id)})
+    order = await find_order(database, {"_id": ObjectId(order_id)})
     if not order:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -94,8 +293,7 @@ async def get_order(order_id: str, current_user: dict = Depends(get_current_user
         )
     
     # Check if user owns this order or is admin
-    user = await database.users.find_one({"email": current_user["email"]})
-    if str(order["user_id"]) != str(user["_id"]) and not current_user.get("is_admin"):
+    if str(order["user_id"]) != current_user.user_id and not current_user.is_admin:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not authorized to view this order"
@@ -104,19 +302,52 @@ async def get_order(order_id: str, current_user: dict = Depends(get_current_user
     return order_helper(order)
 
 # Admin routes
-@router.get("/", response_model=List[OrderResponse])
-async def get_all_orders(current_user: dict = Depends(get_current_admin), status_filter: Optional[str] = None):
+@router.get("/", response_model=OrderPage)
+async def get_all_orders(
+    current_user: TokenData = Depends(get_current_admin),
+    status_filter: Optional[str] = None,
+    limit: int = Query(200, ge=1, le=500),
+    cursor: Optional[str] = None
+):
     database = db.get_db()
     
-    query = {}
-    if status_filter and status_filter != "all":
-        query["status"] = status_filter
+    query = orders_query(status_filter)
+    if cursor:
+        query.update(created_at_cursor_query(cursor))
     
-    orders = await database.orders.find(query).sort("created_at", -1).to_list(200)
-    return [order_helper(order) for order in orders]
+    orders, next_cursor = await fetch_order_page(database, query, limit)
+    return LeanJSONResponse({"items": [order_helper(order) for order in orders], "next_cursor": next_cursor})
+
+# Declared before /{order_id}/status, which would otherwise capture "bulk" as an order id
+@router.patch("/bulk/status")
+async def bulk_update_order_status(status_update: BulkOrderStatusUpdate, current_user: TokenData = Depends(get_current_admin)):
+    database = db.get_db()
+    
+    if not status_update.order_ids:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No order IDs given"
+        )
+    if len(status_update.order_ids) > BULK_STATUS_MAX_ORDERS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {BULK_STATUS_MAX_ORDERS} orders per request"
+        )
+    
+    results, changed = await transition_orders(database, status_update.order_ids, status_update.status)
+    if status_update.status == "cancelled" and await release_order_stock(database, [order for order, _ in changed]):
+        await invalidate_product_cache(database)
+    await enqueue_status_changes(database, changed)
+    
+    return {
+        "requested": len(results),
+        "updated": len(changed),
+        "status": status_update.status,
+        "results": results
+    }
 
 @router.patch("/{order_id}/status", response_model=OrderResponse)
-async def update_order_status(order_id: str, status_update: OrderStatusUpdate, current_user: dict = Depends(get_current_admin)):
+async def update_order_status(order_id: str, status_update: OrderStatusUpdate, current_user: TokenData = Depends(get_current_admin)):
     database = db.get_db()
     
     if not ObjectId.is_valid(order_id):
@@ -125,21 +356,34 @@ async def update_order_status(order_id: str, status_update: OrderStatusUpdate, c
             detail="Invalid order ID"
         )
     
-    result = await database.orders.find_one_and_update(
-        {"_id": ObjectId(order_id)},
-        {
-            "$set": {
-                "status": status_update.status,
-                "updated_at": datetime.utcnow()
-            }
-        },
-        return_document=True
+    update = {
+        "status": status_update.status,
+        "updated_at": datetime.utcnow()
+    }
+    # Only orders in a status that may move to the target are matched
+    previous = await database.orders.find_one_and_update(
+        {"_id": ObjectId(order_id), "status": {"$in": statuses_leading_to(status_update.status) + [status_update.status]}},
+        {"$set": update},
+        return_document=ReturnDocument.BEFORE
     )
     
-    if not result:
+    if not previous:
+        current = await find_order(database, {"_id": ObjectId(order_id)}, {"status": 1})
+        if not current:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Order not found"
+            )
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Order not found"
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Cannot change order status from {current['status']} to {status_update.status}"
         )
     
+    result = {**previous, **update}
+    if result["status"] == "cancelled" and previous["status"] != "cancelled":
+        # Cancelling gives back what checkout reserved; the status guard above makes this happen once
+        if await release_order_stock(database, [previous]):
+            await invalidate_product_cache(database)
+    await enqueue_status_change(database, result, previous["status"], result["status"])
+    
     return order_helper(result)
\ No newline at end of file
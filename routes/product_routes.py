@@ -1,20 +1,62 @@
-from fastapi import APIRouter, HTTPException, status, Depends
-from typing import List, Optional
-from models import Product, ProductResponse
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Request
+from typing import Optional, Union
+from models import Product, ProductResponse, ProductPage, ProductSummaryPage, ProductSearchResult, TokenData
 from auth import get_current_admin
-from database import db
+from database import db, CATALOG_MAX_STALENESS_SECONDS
+from cache import TTLCache
+from pagination import fetch_page, id_cursor, id_cursor_query
+from product_import import parse_products, import_products, new_product_document, product_write_pipeline
+from product_search import SEARCH_SORTS, search_match, run_search
+from serialization import dumps
+from http_cache import RenderedResponse, CatalogVersion, catalog_response
+from metrics import CallbackMetric
+from images import image_variants
 from bson import ObjectId
+import os
 
 router = APIRouter(prefix="/api/products", tags=["Products"])
 
+# Read-through cache of rendered catalog responses; cleared by every admin write below
+PRODUCT_CACHE_TTL_SECONDS = float(os.environ.get("PRODUCT_CACHE_TTL_SECONDS", "300"))
+PRODUCT_CACHE_MAX_ENTRIES = int(os.environ.get("PRODUCT_CACHE_MAX_ENTRIES", "512"))
+
+product_cache = TTLCache(max_entries=PRODUCT_CACHE_MAX_ENTRIES, ttl_seconds=PRODUCT_CACHE_TTL_SECONDS)
+
+CallbackMetric(
+    "product_cache_events_total", "Product cache lookups and evictions", "counter",
+    lambda: {"hit": product_cache.hits, "miss": product_cache.misses, "eviction": product_cache.evictions},
+    ("event",)
+)
+CallbackMetric("product_cache_entries", "Entries held in the product cache", "gauge", lambda: len(product_cache))
+
+catalog_version = CatalogVersion(on_change=product_cache.clear)
+
+async def invalidate_product_cache(database):
+    product_cache.clear()
+    await catalog_version.bump(database)
+
+def catalog_read_db():
+    # Until every usable secondary must have replicated the last catalog write,
+    # fill the cache from the primary so stale documents never get the new version
+    return db.get_catalog_db(recently_changed=catalog_version.changed_within(CATALOG_MAX_STALENESS_SECONDS))
+
+def cache_rendered(cache_key, body: bytes, version: int) -> RenderedResponse:
+    rendered = RenderedResponse(body, version)
+    # Skip caching if the catalog changed while this response was being built
+    if version == catalog_version.value:
+        product_cache.set(cache_key, rendered)
+    return rendered
+
 def product_helper(product) -> dict:
     return {
         "id": str(product["_id"]),
+        "sku": product.get("sku"),
         "name": product["name"],
         "category": product["category"],
         "price": product["price"],
         "original_price": product.get("original_price"),
         "image": product["image"],
+        "image_variants": image_variants(product["image"]),
         "images": product.get("images", []),
         "description": product["description"],
         "details": product["details"],
@@ -25,24 +67,116 @@ def product_helper(product) -> dict:
         "rating": product.get("rating", 4.5),
         "reviews": product.get("reviews", 0),
         "in_stock": product.get("in_stock", True),
+        "stock": product.get("stock"),
         "featured": product.get("featured", False),
         "bestseller": product.get("bestseller", False)
     }
 
-@router.get("/", response_model=List[ProductResponse])
-async def get_all_products(category: Optional[str] = None):
-    database = db.get_db()
+# Fields read from Mongo for view=summary (category grids)
+SUMMARY_PROJECTION = {
+    "name": 1,
+    "category": 1,
+    "price": 1,
+    "original_price": 1,
+    "image": 1,
+    "rating": 1,
+    "in_stock": 1
+}
+
+def product_summary_helper(product) -> dict:
+    return {
+        "id": str(product["_id"]),
+        "name": product["name"],
+        "category": product["category"],
+        "price": product["price"],
+        "original_price": product.get("original_price"),
+        "image": product["image"],
+        "image_variants": image_variants(product["image"]),
+        "rating": product.get("rating", 4.5),
+        "in_stock": product.get("in_stock", True)
+    }
+
+@router.get("/", response_model=Union[ProductPage, ProductSummaryPage])
+async def get_all_products(
+    request: Request,
+    category: Optional[str] = None,
+    view: str = Query("full", pattern="^(full|summary)$"),
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None
+):
+    catalog_version.maybe_refresh(db.get_db())
+    version = catalog_version.value
+    database = catalog_read_db()
     
     query = {}
     if category and category != "all":
         query["category"] = category
     
-    products = await database.products.find(query).to_list(100)
-    return [product_helper(product) for product in products]
+    cache_key = ("list", query.get("category"), view, limit, cursor)
+    cached = product_cache.get(cache_key)
+    if cached is not None:
+        return catalog_response(request, cached)
+    
+    if cursor:
+        query.update(id_cursor_query(cursor))
+    
+    if view == "summary":
+        projection, helper = SUMMARY_PROJECTION, product_summary_helper
+    else:
+        projection, helper = None, product_helper
+    
+    products, next_cursor = await fetch_page(
+        database.products, query, [("_id", 1)], limit, id_cursor, projection=projection
+    )
+    body = dumps({"items": [helper(product) for product in products], "next_cursor": next_cursor})
+    return catalog_response(request, cache_rendered(cache_key, body, version))
+
+@router.get("/search", response_model=ProductSearchResult)
+async def search_products(
+    request: Request,
+    q: Optional[str] = Query(None, max_length=200),
+    category: Optional[str] = None,
+    wax_type: Optional[str] = None,
+    min_price: Optional[int] = Query(None, ge=0),
+    max_price: Optional[int] = Query(None, ge=0),
+    in_stock: Optional[bool] = None,
+    sort: str = Query("relevance", pattern=f"^({'|'.join(SEARCH_SORTS)})$"),
+    view: str = Query("full", pattern="^(full|summary)$"),
+    skip: int = Query(0, ge=0, le=10000),
+    limit: int = Query(24, ge=1, le=100)
+):
+    catalog_version.maybe_refresh(db.get_db())
+    version = catalog_version.value
+    database = catalog_read_db()
+    
+    cache_key = ("search", q, category, wax_type, min_price, max_price, in_stock, sort, view, skip, limit)
+    cached = product_cache.get(cache_key)
+    if cached is not None:
+        return catalog_response(request, cached)
+    
+    if view == "summary":
+        projection, helper = SUMMARY_PROJECTION, product_summary_helper
+    else:
+        projection, helper = None, product_helper
+    
+    match = search_match(q, category, wax_type, min_price, max_price, in_stock)
+    result = await run_search(database.products, match, sort, skip, limit, projection)
+    body = dumps({
+        "items": [helper(product) for product in result["results"]],
+        "total": result["total"],
+        "facets": result["facets"]
+    })
+    return catalog_response(request, cache_rendered(cache_key, body, version))
+
+@router.get("/cache/stats")
+async def get_product_cache_stats(current_user: TokenData = Depends(get_current_admin)):
+    return product_cache.stats()
 
 @router.get("/{product_id}", response_model=ProductResponse)
-async def get_product(product_id: str):
-    database = db.get_db()
+async def get_product(request: Request, product_id: str):
+    catalog_version.maybe_refresh(db.get_db())
+    version = catalog_version.value
+    database = catalog_read_db()
     
     if not ObjectId.is_valid(product_id):
         raise HTTPException(
@@ -50,6 +184,11 @@ async def get_product(product_id: str):
             detail="Invalid product ID"
         )
     
+    cache_key = ("product", product_id)
+    cached = product_cache.get(cache_key)
+    if cached is not None:
+        return catalog_response(request, cached)
+    
     product = await database.products.find_one({"_id": ObjectId(product_id)})
     if not product:
         raise HTTPException(
@@ -57,20 +196,47 @@ async def get_product(product_id: str):
             detail="Product not found"
         )
     
-    return product_helper(product)
+    body = dumps(product_helper(product))
+    return catalog_response(request, cache_rendered(cache_key, body, version))
 
 @router.post("/", response_model=ProductResponse)
-async def create_product(product: Product, current_user: dict = Depends(get_current_admin)):
+async def create_product(product: Product, current_user: TokenData = Depends(get_current_admin)):
     database = db.get_db()
     
-    product_dict = product.dict()
+    product_dict = new_product_document(product)
     result = await database.products.insert_one(product_dict)
+    await invalidate_product_cache(database)
     
     created_product = await database.products.find_one({"_id": result.inserted_id})
     return product_helper(created_product)
 
+@router.post("/bulk")
+async def bulk_import_products(
+    request: Request,
+    format: Optional[str] = Query(None, pattern="^(json|csv)$"),
+    current_user: TokenData = Depends(get_current_admin)
+):
+    database = db.get_db()
+    
+    if format is None:
+        format = "csv" if "csv" in request.headers.get("content-type", "") else "json"
+    
+    try:
+        rows = parse_products(await request.body(), format)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Could not parse {format} body: {e}"
+        )
+    
+    summary = await import_products(database, rows)
+    if summary["upserted"] or summary["modified"]:
+        await invalidate_product_cache(database)
+    
+    return summary
+
 @router.put("/{product_id}", response_model=ProductResponse)
-async def update_product(product_id: str, product: Product, current_user: dict = Depends(get_current_admin)):
+async def update_product(product_id: str, product: Product, current_user: TokenData = Depends(get_current_admin)):
     database = db.get_db()
     
     if not ObjectId.is_valid(product_id):
@@ -79,10 +245,9 @@ async def update_product(product_id: str, product: Product, current_user: dict =
             detail="Invalid product ID"
         )
     
-    product_dict = product.dict()
     result = await database.products.find_one_and_update(
         {"_id": ObjectId(product_id)},
-        {"$set": product_dict},
+        product_write_pipeline(product),
         return_document=True
     )
     
@@ -92,10 +257,11 @@ async def update_product(product_id: str, product: Product, current_user: dict =
             detail="Product not found"
         )
     
+    await invalidate_product_cache(database)
     return product_helper(result)
 
 @router.delete("/{product_id}")
-async def delete_product(product_id: str, current_user: dict = Depends(get_current_admin)):
+async def delete_product(product_id: str, current_user: TokenData = Depends(get_current_admin)):
     database = db.get_db()
     
     if not ObjectId.is_valid(product_id):
@@ -105,6 +271,7 @@ async def delete_product(product_id: str, current_user: dict = Depends(get_curre
         )
     
     result = await database.products.delete_one({"_id": ObjectId(product_id)})
+    await invalidate_product_cache(database)
     
     if result.deleted_count == 0:
         raise HTTPException(
@@ -0,0 +1,30 @@
+from fastapi.responses import Response
+from bson import ObjectId
+from datetime import date, datetime
+import json
+
+def _default(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+# Built once so every call goes straight to the C encoder
+_encoder = json.JSONEncoder(default=_default, separators=(",", ":"), ensure_ascii=False)
+
+def dumps(content) -> bytes:
+    return _encoder.encode(content).encode("utf-8")
+
+class LeanJSONResponse(Response):
+    """
+    JSON response for trusted documents already shaped by a *_helper function.
+    Returning a Response skips FastAPI's response_model validation and
+    jsonable_encoder pass, while the route's response_model still drives OpenAPI.
+    """
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return dumps(content)
@@ -0,0 +1,97 @@
+"""
+Production entry point: runs the API under uvicorn with one worker per available core
+    python serve.py                        # PORT, WEB_CONCURRENCY and GRACEFUL_SHUTDOWN_SECONDS from the env
+Indexes are created once here, before the workers start, instead of once per worker.
+On SIGTERM uvicorn stops accepting connections and lets in-flight requests finish
+for up to GRACEFUL_SHUTDOWN_SECONDS before each worker runs its shutdown.
+"""
+import asyncio
+import math
+import os
+import time
+
+import config
+import uvicorn
+
+PORT = int(os.environ.get("PORT", "8000"))
+HOST = os.environ.get("HOST", "0.0.0.0")
+# Heroku sends SIGKILL 30 seconds after SIGTERM
+GRACEFUL_SHUTDOWN_SECONDS = int(os.environ.get("GRACEFUL_SHUTDOWN_SECONDS", "25"))
+# Heroku's router address isn't fixed, hence "*"; that makes request.client the
+# client-supplied X-Forwarded-For entry, so ratelimit.client_ip doesn't rely on it
+FORWARDED_ALLOW_IPS = os.environ.get("FORWARDED_ALLOW_IPS", "*")
+
+def available_cpus() -> int:
+    """Cores this process may use, honouring CPU affinity and cgroup quotas."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+
+    quota = None
+    try:
+        # cgroup v2: "<quota> <period>" or "max <period>"
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            limit, period = f.read().split()
+        if limit != "max":
+            quota = int(limit) / int(period)
+    except (OSError, ValueError):
+        try:
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+                limit = int(f.read())
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+                period = int(f.read())
+            if limit > 0:
+                quota = limit / period
+        except (OSError, ValueError):
+            pass
+
+    if quota is not None:
+        cpus = min(cpus, max(1, math.ceil(quota)))
+    return max(1, cpus)
+
+def worker_count(cpus: int) -> int:
+    return max(1, int(os.environ.get("WEB_CONCURRENCY") or cpus))
+
+async def prepare_database():
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from database import DB_NAME, MONGO_URL, client_options
+    from indexes import ensure_indexes
+
+    client = AsyncIOMotorClient(MONGO_URL, **client_options())
+    try:
+        await client.admin.command("ping")
+        await ensure_indexes(client[DB_NAME])
+    except Exception as e:
+        # Workers retry on their own startup rather than the whole launch failing here
+        print(f"⚠️  Could not create indexes before starting workers: {e}")
+        return False
+    finally:
+        client.close()
+    return True
+
+def main():
+    cpus = available_cpus()
+    workers = worker_count(cpus)
+
+    # Each worker gets its own bcrypt pool; split the cores instead of oversubscribing them
+    os.environ.setdefault("PASSWORD_POOL_WORKERS", str(max(1, cpus // workers)))
+
+    started = time.perf_counter()
+    if asyncio.run(prepare_database()):
+        os.environ["MONGO_ENSURE_INDEXES"] = "0"
+        print(f"Ensured indexes in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+    print(f"Starting {workers} worker(s) on {HOST}:{PORT} ({cpus} CPU(s) available)")
+    uvicorn.run(
+        "server:app",
+        host=HOST,
+        port=PORT,
+        workers=workers,
+        proxy_headers=True,
+        forwarded_allow_ips=FORWARDED_ALLOW_IPS,
+        timeout_graceful_shutdown=GRACEFUL_SHUTDOWN_SECONDS,
+    )
+
+if __name__ == "__main__":
+    main()
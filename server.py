@@ -1,41 +1,94 @@
-from fastapi import FastAPI
+import time
+
+_import_started = time.perf_counter()
+
+import config
+from contextlib import asynccontextmanager
+from fastapi import APIRouter, FastAPI, Response
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 import os
-from dotenv import load_dotenv
 from database import db
-from routes import auth_routes, product_routes, order_routes
-
-load_dotenv()
-
-app = FastAPI(title="The Handmade Glow API", version="1.0.0")
-
-# CORS configuration
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=[
-        "http://localhost:3000",
-        "https://thehandmadeglow-frontend.vercel.app/"
-    ],
-    allow_credentials=False,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# Startup and shutdown events
-@app.on_event("startup")
-async def startup_db_client():
+from auth import password_pool
+from revocation import revocation_list
+from jobs import job_queue
+from metrics import Gauge, PrometheusMiddleware, render as render_metrics
+from images import image_pool
+from routes import auth_routes, product_routes, order_routes, analytics_routes, image_routes
+
+IMPORT_SECONDS = time.perf_counter() - _import_started
+
+app_startup_seconds = Gauge("app_startup_seconds", "Time this worker spent importing and starting the app", ("phase",))
+app_startup_seconds.set(("import",), IMPORT_SECONDS)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Runs once per worker process, so each worker owns one Mongo client and pool
+    started = time.perf_counter()
     await db.connect_db()
-    print("✅ Backend server started successfully")
+    try:
+        await revocation_list.sync(db.get_db(), rebuild=True)
+    except Exception as e:
+        print(f"⚠️  Could not load revoked tokens: {e}")
+    job_queue.start(db.get_db())
+    startup_seconds = time.perf_counter() - started
+    app_startup_seconds.set(("startup",), startup_seconds)
+    print(
+        f"✅ Backend server started successfully in {startup_seconds * 1000:.0f} ms "
+        f"(imports {IMPORT_SECONDS * 1000:.0f} ms, pid {os.getpid()})"
+    )
+
+    yield
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
+    await job_queue.stop()
     await db.close_db()
+    password_pool.shutdown()
+    image_pool.shutdown()
 
-# Include routers
-app.include_router(auth_routes.router)
-app.include_router(product_routes.router)
-app.include_router(order_routes.router)
+system_router = APIRouter(prefix="/api")
 
-@app.get("/api/")
+@system_router.get("/")
 async def root():
     return {"message": "The Handmade Glow API is running!", "status": "healthy"}
+
+@system_router.get("/ready")
+async def ready():
+    try:
+        ping_ms = await db.ping()
+    except Exception as e:
+        return JSONResponse(
+            status_code=503,
+            content={"status": "unavailable", "error": str(e) or type(e).__name__, "pool": db.pool_stats()}
+        )
+    return {"status": "ready", "mongo_ping_ms": round(ping_ms, 2), "pool": db.pool_stats()}
+
+@system_router.get("/metrics", include_in_schema=False)
+async def metrics():
+    return Response(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+def create_app() -> FastAPI:
+    app = FastAPI(title="The Handmade Glow API", version="1.0.0", lifespan=lifespan)
+
+    # CORS configuration
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=[
+            "http://localhost:3000",
+            "https://thehandmadeglow-frontend.vercel.app/"
+        ],
+        allow_credentials=False,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    app.add_middleware(PrometheusMiddleware)
+
+    # Include routers
+    app.include_router(auth_routes.router)
+    app.include_router(product_routes.router)
+    app.include_router(order_routes.router)
+    app.include_router(analytics_routes.router)
+    app.include_router(image_routes.router)
+    app.include_router(system_router)
+    return app
+
+app = create_app()